@@ -1,7 +1,7 @@
 import os
 import json
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+from clients import get_llm, llm_breaker
 
 # Load environment variables
 load_dotenv()
@@ -18,11 +18,7 @@ class RiskAgent:
             )
         
         try:
-            self.model = ChatGroq(
-                temperature=0.3,
-                model_name="llama-3.3-70b-versatile",
-                api_key=self.groq_api_key
-            )
+            self.model = get_llm(0.3)
         except Exception as e:
             # Degrade gracefully if LLM fails to initialize
             print(f"Warning: Groq model initialization failed: {e}")
@@ -36,6 +32,54 @@ class RiskAgent:
         except Exception:
             self.prompt_template = "{token} {merchant_id} {amount}"
     
+    def _build_prompt(self, transaction_data):
+        return self.prompt_template.format(
+            token=transaction_data.get("token", "unknown"),
+            merchant_id=transaction_data.get("merchant_id", "unknown"),
+            amount=transaction_data.get("amount", 0),
+            token_age_minutes=transaction_data.get("token_age_minutes", 0),
+            device_trust_score=transaction_data.get("device_trust_score", 0),
+            usual_location=transaction_data.get("usual_location", "unknown"),
+            current_location=transaction_data.get("current_location", "unknown"),
+            user_avg_amount=transaction_data.get("user_avg_amount", 0),
+            recent_transactions=transaction_data.get("recent_transactions", 0),
+            new_device=transaction_data.get("new_device", False),
+            vpn_detected=transaction_data.get("vpn_detected", False),
+            unusual_time=transaction_data.get("unusual_time", False),
+            rushed_transaction=transaction_data.get("rushed_transaction", False),
+            user_history=json.dumps(transaction_data.get("user_history", {})),
+            user_profile=json.dumps(transaction_data.get("user_profile", {}))
+        )
+    
+    def _parse_response(self, response):
+        # Extract content from response
+        response_text = response.content if hasattr(response, 'content') else str(response)
+        
+        # Try to parse JSON response
+        try:
+            # Clean response - remove markdown code blocks if present
+            cleaned_response = response_text.strip()
+            if cleaned_response.startswith("```json"):
+                cleaned_response = cleaned_response.split("```json")[1].split("```")[0].strip()
+            elif cleaned_response.startswith("```"):
+                cleaned_response = cleaned_response.split("```")[1].split("```")[0].strip()
+            
+            result = json.loads(cleaned_response)
+            
+            return {
+                "risk_score": result.get("risk_score", 50),
+                "decision": result.get("decision", "CHALLENGE"),
+                "explanation": result.get("explanation", "Unable to assess risk")
+            }
+        except json.JSONDecodeError:
+            # If JSON parsing fails, return default values
+            print(f"Warning: Could not parse JSON response: {response_text[:200]}")
+            return {
+                "risk_score": 50,
+                "decision": "CHALLENGE",
+                "explanation": "AI response parsing failed - defaulting to challenge"
+            }
+    
     def analyze_risk(self, transaction_data):
         """
         Analyze transaction risk using Groq AI
@@ -48,54 +92,10 @@ class RiskAgent:
         """
         try:
             # Prepare prompt with transaction data
-            prompt = self.prompt_template.format(
-                token=transaction_data.get("token", "unknown"),
-                merchant_id=transaction_data.get("merchant_id", "unknown"),
-                amount=transaction_data.get("amount", 0),
-                token_age_minutes=transaction_data.get("token_age_minutes", 0),
-                device_trust_score=transaction_data.get("device_trust_score", 0),
-                usual_location=transaction_data.get("usual_location", "unknown"),
-                current_location=transaction_data.get("current_location", "unknown"),
-                user_avg_amount=transaction_data.get("user_avg_amount", 0),
-                recent_transactions=transaction_data.get("recent_transactions", 0),
-                new_device=transaction_data.get("new_device", False),
-                vpn_detected=transaction_data.get("vpn_detected", False),
-                unusual_time=transaction_data.get("unusual_time", False),
-                rushed_transaction=transaction_data.get("rushed_transaction", False),
-                user_history=json.dumps(transaction_data.get("user_history", {})),
-                user_profile=json.dumps(transaction_data.get("user_profile", {}))
-            )
+            prompt = self._build_prompt(transaction_data)
             
             # Call Groq AI
-            response = self.model.invoke(prompt)
-            
-            # Extract content from response
-            response_text = response.content if hasattr(response, 'content') else str(response)
-            
-            # Try to parse JSON response
-            try:
-                # Clean response - remove markdown code blocks if present
-                cleaned_response = response_text.strip()
-                if cleaned_response.startswith("json"):
-                    cleaned_response = cleaned_response.split("json")[1].split("")[0].strip()
-                elif cleaned_response.startswith(""):
-                    cleaned_response = cleaned_response.split("")[1].split("")[0].strip()
-                
-                result = json.loads(cleaned_response)
-                
-                return {
-                    "risk_score": result.get("risk_score", 50),
-                    "decision": result.get("decision", "CHALLENGE"),
-                    "explanation": result.get("explanation", "Unable to assess risk")
-                }
-            except json.JSONDecodeError:
-                # If JSON parsing fails, return default values
-                print(f"Warning: Could not parse JSON response: {response_text[:200]}")
-                return {
-                    "risk_score": 50,
-                    "decision": "CHALLENGE",
-                    "explanation": "AI response parsing failed - defaulting to challenge"
-                }
+            return self._parse_response(llm_breaker.call(self.model.invoke, prompt))
         
         except Exception as e:
             print(f"Error in risk analysis: {str(e)}")
@@ -104,4 +104,18 @@ class RiskAgent:
                 "risk_score": 50,
                 "decision": "CHALLENGE",
                 "explanation": f"Error occurred: {str(e)}"
-            }
\ No newline at end of file
+            }
+    
+    async def analyze_risk_async(self, transaction_data):
+        """Same as analyze_risk, but awaits the Groq call so the event loop isn't blocked"""
+        try:
+            prompt = self._build_prompt(transaction_data)
+            return self._parse_response(await llm_breaker.call_async(self.model.ainvoke, prompt))
+        
+        except Exception as e:
+            print(f"Error in risk analysis: {str(e)}")
+            return {
+                "risk_score": 50,
+                "decision": "CHALLENGE",
+                "explanation": f"Error occurred: {str(e)}"
+            }
@@ -1,15 +1,23 @@
 import os
 import json
 import asyncio
+import orjson
 from datetime import datetime
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+from clients import get_llm, llm_breaker
 from langchain_core.messages import HumanMessage
 
 # Load environment variables
 load_dotenv()
 
+# Verification records are mirrored to Redis, indexed by a per-merchant set of
+# pending session ids, so merchant lookups don't scan every pending verification.
+# A session id leaves the set once its verification completes or expires
+VERIFICATION_KEY_PREFIX = "verification:"
+MERCHANT_PENDING_KEY = "merchant:{}:pending"
+VERIFICATION_TTL_SECONDS = 86_400
+
 class MerchantCommunicator:
     """
     Agent responsible for communicating with merchants:
@@ -19,7 +27,7 @@ class MerchantCommunicator:
     - Handling merchant authentication
     """
     
-    def __init__(self):
+    def __init__(self, redis_client=None):
         self.groq_api_key = os.getenv("GROQ_API_KEY")
         
         if not self.groq_api_key or self.groq_api_key == "your_groq_api_key_here":
@@ -28,14 +36,14 @@ class MerchantCommunicator:
                 "Please set your Groq API key in the .env file."
             )
         
-        self.llm = ChatGroq(
-            temperature=0.2,
-            model_name="llama-3.3-70b-versatile",
-            api_key=self.groq_api_key
-        )
+        self.llm = get_llm(0.2)
+        
+        # Optional shared async Redis client; when set, verifications are mirrored there
+        self.redis_client = redis_client
         
-        # In-memory storage for pending verifications (use Redis in production)
+        # In-memory storage for pending verifications, plus a per-merchant index of the pending ones
         self.pending_verifications = {}
+        self.verifications_by_merchant: Dict[str, Dict[str, Dict[str, Any]]] = {}
         self.merchant_profiles = {}
         self.communication_history = {}
     
@@ -75,6 +83,8 @@ class MerchantCommunicator:
             
             # Store pending verification
             self.pending_verifications[session_id] = verification_request
+            self.verifications_by_merchant.setdefault(merchant_id, {})[session_id] = verification_request
+            await self._persist_verification(verification_request)
             
             # Send verification request through multiple channels
             send_result = await self._send_verification_request(verification_request, merchant_profile)
@@ -113,6 +123,7 @@ class MerchantCommunicator:
         # Check if verification has expired
         if self._is_verification_expired(verification):
             verification["status"] = "expired"
+            await self._persist_verification(verification)
             return {
                 "status": "timeout",
                 "message": "Verification request expired",
@@ -127,6 +138,7 @@ class MerchantCommunicator:
             verification["status"] = "completed"
             verification["completed_at"] = datetime.now().isoformat()
             verification["merchant_response"] = response_status["response"]
+            await self._persist_verification(verification)
             
             return {
                 "status": "completed",
@@ -172,6 +184,7 @@ class MerchantCommunicator:
             verification["status"] = "completed"
             verification["completed_at"] = datetime.now().isoformat()
             verification["merchant_response"] = merchant_response
+            await self._persist_verification(verification)
             
             # Log the response
             self._log_communication(verification["merchant_id"], "2fa_response_received", merchant_response)
@@ -248,7 +261,7 @@ class MerchantCommunicator:
         """
         
         try:
-            response = self.llm.invoke([HumanMessage(content=prompt)])
+            response = await llm_breaker.call_async(self.llm.ainvoke, [HumanMessage(content=prompt)])
             strategy = json.loads(response.content.strip().replace("```json", "").replace("```", ""))
             
             # Add calculated expiry time
@@ -338,7 +351,7 @@ class MerchantCommunicator:
         """
         
         try:
-            response = self.llm.invoke([HumanMessage(content=prompt)])
+            response = await llm_breaker.call_async(self.llm.ainvoke, [HumanMessage(content=prompt)])
             return json.loads(response.content.strip().replace("```json", "").replace("```", ""))
         except:
             # Fallback message
@@ -412,7 +425,7 @@ class MerchantCommunicator:
         """
         
         try:
-            response = self.llm.invoke([HumanMessage(content=prompt)])
+            response = await llm_breaker.call_async(self.llm.ainvoke, [HumanMessage(content=prompt)])
             return json.loads(response.content.strip().replace("```json", "").replace("```", ""))
         except:
             return {
@@ -460,6 +473,64 @@ class MerchantCommunicator:
         """Get all pending verifications"""
         return self.pending_verifications
     
+    async def get_merchant_verifications(self, merchant_id: str) -> Dict[str, Any]:
+        """Get pending verifications for one merchant: SMEMBERS + MGET across workers, or the local index"""
+        if self.redis_client is not None:
+            try:
+                session_ids = sorted(await self.redis_client.smembers(MERCHANT_PENDING_KEY.format(merchant_id)))
+                if not session_ids:
+                    return {}
+                records = await self.redis_client.mget([VERIFICATION_KEY_PREFIX + sid for sid in session_ids])
+                # Records whose key already expired come back as None; ones that passed
+                # expires_at without being polled are dropped from the index here
+                verifications, stale = {}, []
+                for sid, raw in zip(session_ids, records):
+                    record = orjson.loads(raw) if raw else None
+                    if record is None or record.get("status") != "pending" or self._is_verification_expired(record):
+                        stale.append(sid)
+                    else:
+                        verifications[sid] = record
+                if stale:
+                    await self.redis_client.srem(MERCHANT_PENDING_KEY.format(merchant_id), *stale)
+                return verifications
+            except Exception as e:
+                print(f"⚠️  Merchant verification lookup in Redis failed: {str(e)}")
+        return {
+            sid: record
+            for sid, record in self.verifications_by_merchant.get(merchant_id, {}).items()
+            if not self._is_verification_expired(record)
+        }
+    
+    async def _persist_verification(self, verification: Dict[str, Any]):
+        """Write a verification record to Redis and keep its merchant's pending index in step"""
+        merchant_id = verification["merchant_id"]
+        session_id = verification["session_id"]
+        pending = verification.get("status") == "pending"
+        if not pending:
+            merchant_index = self.verifications_by_merchant.get(merchant_id)
+            if merchant_index is not None:
+                merchant_index.pop(session_id, None)
+                if not merchant_index:
+                    del self.verifications_by_merchant[merchant_id]
+        if self.redis_client is None:
+            return
+        try:
+            merchant_key = MERCHANT_PENDING_KEY.format(merchant_id)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.setex(
+                VERIFICATION_KEY_PREFIX + session_id,
+                VERIFICATION_TTL_SECONDS,
+                orjson.dumps(verification, default=str)
+            )
+            if pending:
+                pipe.sadd(merchant_key, session_id)
+                pipe.expire(merchant_key, VERIFICATION_TTL_SECONDS)
+            else:
+                pipe.srem(merchant_key, session_id)
+            await pipe.execute()
+        except Exception as e:
+            print(f"⚠️  Failed to persist verification: {str(e)}")
+    
     def get_merchant_communication_history(self, merchant_id: str) -> Optional[list]:
         """Get communication history for a merchant"""
         return self.communication_history.get(merchant_id)
\ No newline at end of file
@@ -2,21 +2,47 @@ import os
 import json
 from pathlib import Path
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+from clients import get_llm, llm_breaker
 
 # Load environment variables
 load_dotenv()
 
+def _as_float(value, default=0.0):
+    try:
+        return float(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+# Rule-based fast path: (predicate, risk_score, decision, explanation template).
+# Rules are checked in order and only cover unambiguous cases; anything that
+# doesn't match goes to the LLM. Predicates receive the features dict built
+# in fast_classify.
+_FAST_PATH_RULES = (
+    (
+        lambda f: f["first_transaction"] and f["high_risk_flags"] >= 2,
+        90, "HIGH",
+        "First transaction with {high_risk_flags} high-risk flags."
+    ),
+    (
+        lambda f: f["token_age_minutes"] > 1440 and f["device_trust_score"] < 30 and f["high_risk_flags"] >= 2,
+        90, "FREEZE",
+        "High risk detected. Suspicious factors: expired token ({token_age_minutes:.0f} minutes old), "
+        "very low device trust ({device_trust_score:.0f}/100) and {high_risk_flags} other risk signals."
+    ),
+    (
+        lambda f: (not f["first_transaction"] and f["high_risk_flags"] == 0
+                   and f["amount_ratio"] <= 2 and f["device_trust_score"] >= 80
+                   and f["token_age_minutes"] <= 1440),
+        10, "APPROVE",
+        "Low risk. Trusted device ({device_trust_score:.0f}/100), usual location and an amount in line "
+        "with this user's history ({amount_ratio:.1f}x average)."
+    ),
+)
+
 class AgenticRiskAgent:
     def __init__(self, memory_path="agent_memory.json"):
         # Initialize Groq model
         self.groq_api_key = os.getenv("GROQ_API_KEY")
-        self.model = ChatGroq(
-            temperature=0.3,
-            model_name="llama-3.3-70b-versatile",
-            api_key=self.groq_api_key
-        )
-        
         if not self.groq_api_key or self.groq_api_key == "your_groq_api_key_here":
             raise ValueError(
                 "GROQ_API_KEY not found or not set properly. "
@@ -25,11 +51,7 @@ class AgenticRiskAgent:
             )
         
         try:
-            self.model = ChatGroq(
-                temperature=0.3,
-                model_name="llama-3.3-70b-versatile",  # Updated: mixtral-8x7b-32768 is decommissioned
-                api_key=self.groq_api_key
-            )
+            self.model = get_llm(0.3)
         except Exception as e:
             raise ValueError(f"Failed to initialize Groq model: {str(e)}")
         
@@ -71,16 +93,125 @@ class AgenticRiskAgent:
 
         amount_ratio = amount_val / user_avg
         location_changed = transaction.get("current_location") != transaction.get("usual_location")
-        high_risk_flags = sum([
-            bool(transaction.get("new_device", False)),
-            bool(transaction.get("vpn_detected", False)),
-            bool(transaction.get("unusual_time", False)),
-            bool(transaction.get("rushed_transaction", False)),
-            bool(location_changed),
-            bool(amount_ratio > 5)
-        ])
+        # Plain int addition of the boolean signals; no per-call list or sum()
+        high_risk_flags = (
+            bool(transaction.get("new_device", False)) +
+            bool(transaction.get("vpn_detected", False)) +
+            bool(transaction.get("unusual_time", False)) +
+            bool(transaction.get("rushed_transaction", False)) +
+            location_changed +
+            (amount_ratio > 5)
+        )
         return amount_ratio, location_changed, high_risk_flags, history
     
+    def fast_classify(self, transaction):
+        """
+        Classify obviously safe or obviously risky transactions without the LLM.
+        Returns a risk result dict if a fast-path rule fires, otherwise None.
+        """
+        amount_ratio, _, high_risk_flags, history = self._compute_features(transaction)
+        return self._fast_classify_features(transaction, amount_ratio, high_risk_flags, history)
+    
+    def _fast_classify_features(self, transaction, amount_ratio, high_risk_flags, history):
+        features = {
+            "first_transaction": len(history["transactions"]) == 0,
+            "high_risk_flags": high_risk_flags,
+            "amount_ratio": amount_ratio,
+            "token_age_minutes": _as_float(transaction.get("token_age_minutes")),
+            "device_trust_score": _as_float(transaction.get("device_trust_score")),
+        }
+        for predicate, risk_score, decision, explanation in _FAST_PATH_RULES:
+            if predicate(features):
+                return {
+                    "risk_score": risk_score,
+                    "decision": decision,
+                    "explanation": explanation.format(**features)
+                }
+        return None
+    
+    def _prepare_analysis(self, transaction):
+        """
+        Observe the transaction, retrieve memory and compute features.
+        Returns (history, prompt, override_result); override_result is set when
+        the rule-based override decides the outcome and no LLM call is needed.
+        """
+        token = transaction.get("token")
+        amount_ratio, location_changed, high_risk_flags, history = self._compute_features(transaction)
+        
+        # Rule-based fast path for unambiguous transactions (no LLM call)
+        override_result = self._fast_classify_features(
+            transaction, amount_ratio, high_risk_flags, history
+        )
+        if override_result is not None:
+            return history, None, override_result
+        
+        # Prepare prompt for Groq
+        prompt = self.prompt_template.format(
+            token=token,
+            merchant_id=transaction.get("merchant_id", "unknown"),
+            amount=transaction.get("amount", 0),
+            token_age_minutes=transaction.get("token_age_minutes", 0),
+            device_trust_score=transaction.get("device_trust_score", 0),
+            usual_location=transaction.get("usual_location", "unknown"),
+            current_location=transaction.get("current_location", "unknown"),
+            user_avg_amount=history.get("avg_amount", transaction.get("user_avg_amount", 0)),
+            recent_transactions=len(history["transactions"]),
+            new_device=transaction.get("new_device", False),
+            vpn_detected=transaction.get("vpn_detected", False),
+            unusual_time=transaction.get("unusual_time", False),
+            rushed_transaction=transaction.get("rushed_transaction", False),
+            user_history=json.dumps(transaction.get("user_history", {})),
+            user_profile=json.dumps(transaction.get("user_profile", {})),
+            amount_ratio=amount_ratio,
+            location_changed=location_changed,
+            high_risk_flags=high_risk_flags
+        )
+        return history, prompt, None
+    
+    def _parse_model_response(self, response):
+        response_text = response.content if hasattr(response, 'content') else str(response)
+        
+        # Robust JSON parsing
+        try:
+            cleaned_response = response_text.strip()
+            if cleaned_response.startswith("```json"):
+                cleaned_response = cleaned_response.split("```json")[1].split("```")[0].strip()
+            elif cleaned_response.startswith("```"):
+                cleaned_response = cleaned_response.split("```")[1].split("```")[0].strip()
+            result = json.loads(cleaned_response)
+            return {
+                "risk_score": result.get("risk_score", 50),
+                "decision": result.get("decision", "CHALLENGE"),
+                "explanation": result.get("explanation", "Unable to assess risk")
+            }
+        except json.JSONDecodeError:
+            print(f"Warning: Could not parse Groq response: {response_text[:200]}")
+            return {"risk_score": 50, "decision": "CHALLENGE", "explanation": "AI response parsing failed"}
+    
+    def _update_memory(self, transaction, history):
+        # Update memory (defensively handle None values)
+        token = transaction.get("token")
+        existing_tx = history.get("transactions") or []
+        existing_count = len(existing_tx)
+        raw_existing_avg = history.get("avg_amount", 0)
+        try:
+            existing_avg = float(raw_existing_avg) if raw_existing_avg is not None else 0.0
+        except (TypeError, ValueError):
+            existing_avg = 0.0
+
+        raw_amount = transaction.get("amount", 0)
+        try:
+            amount_val = float(raw_amount) if raw_amount is not None else 0.0
+        except (TypeError, ValueError):
+            amount_val = 0.0
+
+        new_avg = (existing_avg * existing_count + amount_val) / (existing_count + 1)
+        token_memory = self.memory.get(token, {"transactions": [], "avg_amount": 0})
+        token_memory["transactions"].append(transaction)
+        token_memory["avg_amount"] = new_avg
+        self.memory[token] = token_memory
+        self._save_memory()
+    
     def analyze_risk(self, transaction):
         """
         Agentic risk analysis:
@@ -92,82 +223,25 @@ class AgenticRiskAgent:
         6. Return final decision
         """
         try:
-            token = transaction.get("token")
-            amount_ratio, location_changed, high_risk_flags, history = self._compute_features(transaction)
-            first_transaction = len(history["transactions"]) == 0
+            history, prompt, risk_result = self._prepare_analysis(transaction)
+            if risk_result is None:
+                risk_result = self._parse_model_response(llm_breaker.call(self.model.invoke, prompt))
             
-            # Rule-based override for first-time high-risk transactions
-            if first_transaction and high_risk_flags >= 2:
-                risk_result = {
-                    "risk_score": 90,
-                    "decision": "HIGH",
-                    "explanation": f"First transaction with {high_risk_flags} high-risk flags."
-                }
-            else:
-                # Prepare prompt for Groq
-                prompt = self.prompt_template.format(
-                    token=token,
-                    merchant_id=transaction.get("merchant_id", "unknown"),
-                    amount=transaction.get("amount", 0),
-                    token_age_minutes=transaction.get("token_age_minutes", 0),
-                    device_trust_score=transaction.get("device_trust_score", 0),
-                    usual_location=transaction.get("usual_location", "unknown"),
-                    current_location=transaction.get("current_location", "unknown"),
-                    user_avg_amount=history.get("avg_amount", transaction.get("user_avg_amount", 0)),
-                    recent_transactions=len(history["transactions"]),
-                    new_device=transaction.get("new_device", False),
-                    vpn_detected=transaction.get("vpn_detected", False),
-                    unusual_time=transaction.get("unusual_time", False),
-                    rushed_transaction=transaction.get("rushed_transaction", False),
-                    user_history=json.dumps(transaction.get("user_history", {})),
-                    user_profile=json.dumps(transaction.get("user_profile", {})),
-                    amount_ratio=amount_ratio,
-                    location_changed=location_changed,
-                    high_risk_flags=high_risk_flags
-                )
-                
-                response = self.model.invoke(prompt)
-                response_text = response.content if hasattr(response, 'content') else str(response)
-                
-                # Robust JSON parsing
-                try:
-                    cleaned_response = response_text.strip()
-                    if cleaned_response.startswith("```json"):
-                        cleaned_response = cleaned_response.split("```json")[1].split("```")[0].strip()
-                    elif cleaned_response.startswith("```"):
-                        cleaned_response = cleaned_response.split("```")[1].split("```")[0].strip()
-                    result = json.loads(cleaned_response)
-                    risk_result = {
-                        "risk_score": result.get("risk_score", 50),
-                        "decision": result.get("decision", "CHALLENGE"),
-                        "explanation": result.get("explanation", "Unable to assess risk")
-                    }
-                except json.JSONDecodeError:
-                    print(f"Warning: Could not parse Groq response: {response_text[:200]}")
-                    risk_result = {"risk_score": 50, "decision": "CHALLENGE", "explanation": "AI response parsing failed"}
-            
-            # Update memory (defensively handle None values)
-            existing_tx = history.get("transactions") or []
-            existing_count = len(existing_tx)
-            raw_existing_avg = history.get("avg_amount", 0)
-            try:
-                existing_avg = float(raw_existing_avg) if raw_existing_avg is not None else 0.0
-            except (TypeError, ValueError):
-                existing_avg = 0.0
-
-            raw_amount = transaction.get("amount", 0)
-            try:
-                amount_val = float(raw_amount) if raw_amount is not None else 0.0
-            except (TypeError, ValueError):
-                amount_val = 0.0
-
-            new_avg = (existing_avg * existing_count + amount_val) / (existing_count + 1)
-            token_memory = self.memory.get(token, {"transactions": [], "avg_amount": 0})
-            token_memory["transactions"].append(transaction)
-            token_memory["avg_amount"] = new_avg
-            self.memory[token] = token_memory
-            self._save_memory()
+            self._update_memory(transaction, history)
+            return risk_result
+        
+        except Exception as e:
+            print(f"Error in agentic analysis: {str(e)}")
+            return {"risk_score": 50, "decision": "CHALLENGE", "explanation": str(e)}
+    
+    async def analyze_risk_async(self, transaction):
+        """Same as analyze_risk, but awaits the Groq call so the event loop isn't blocked"""
+        try:
+            history, prompt, risk_result = self._prepare_analysis(transaction)
+            if risk_result is None:
+                risk_result = self._parse_model_response(await llm_breaker.call_async(self.model.ainvoke, prompt))
             
+            self._update_memory(transaction, history)
             return risk_result
         
         except Exception as e:
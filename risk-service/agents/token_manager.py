@@ -4,7 +4,7 @@ import asyncio
 from datetime import datetime
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+from clients import get_llm, llm_breaker
 from langchain_core.messages import HumanMessage
 
 # Load environment variables
@@ -28,11 +28,7 @@ class TokenManager:
                 "Please set your Groq API key in the .env file."
             )
         
-        self.llm = ChatGroq(
-            temperature=0.1,
-            model_name="llama-3.3-70b-versatile",
-            api_key=self.groq_api_key
-        )
+        self.llm = get_llm(0.1)
         
         # In-memory token state storage (in production, use Redis/Database)
         self.token_states = {}
@@ -244,7 +240,7 @@ class TokenManager:
         """
         
         try:
-            response = self.llm.invoke([HumanMessage(content=prompt)])
+            response = await llm_breaker.call_async(self.llm.ainvoke, [HumanMessage(content=prompt)])
             return json.loads(response.content.strip().replace("```json", "").replace("```", ""))
         except:
             # Fallback parameters
@@ -277,7 +273,7 @@ class TokenManager:
         """
         
         try:
-            response = self.llm.invoke([HumanMessage(content=prompt)])
+            response = await llm_breaker.call_async(self.llm.ainvoke, [HumanMessage(content=prompt)])
             return json.loads(response.content.strip().replace("```json", "").replace("```", ""))
         except:
             return {
@@ -315,7 +311,7 @@ class TokenManager:
         """
         
         try:
-            response = self.llm.invoke([HumanMessage(content=prompt)])
+            response = await llm_breaker.call_async(self.llm.ainvoke, [HumanMessage(content=prompt)])
             return json.loads(response.content.strip().replace("```json", "").replace("```", ""))
         except:
             return {
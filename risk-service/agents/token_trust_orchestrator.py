@@ -1,20 +1,33 @@
 import os
 import json
 import asyncio
+import logging
 import uuid
+import orjson
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional
+from functools import cached_property
+from typing import Dict, Any, Optional, Set
 from dotenv import load_dotenv
 from langchain_groq import ChatGroq
+from clients import get_llm, llm_breaker
 from langchain_core.messages import SystemMessage, HumanMessage
 
 # Load environment variables
 load_dotenv()
-from .risk_agent import RiskAgent
+from .ai_risk_analyzer import RiskAgent
 from .token_manager import TokenManager
 from .merchant_communicator import MerchantCommunicator
 from .verification_agent import VerificationAgent
 
+logger = logging.getLogger(__name__)
+
+# Session snapshots are mirrored to Redis so every worker can report on them;
+# key expiry replaces the periodic cleanup scan for the shared copy. A sorted
+# set of session ids scored by expiry time counts them without a keyspace SCAN
+SESSION_KEY_PREFIX = "session:"
+ACTIVE_SESSIONS_KEY = "sessions:active"
+SESSION_TTL_SECONDS = 86_400
+
 class TokenTrustOrchestrator:
     """
     Main orchestrator that manages the complete token trust workflow:
@@ -25,7 +38,7 @@ class TokenTrustOrchestrator:
     5. Final Decision (Unfreeze/Revoke)
     """
     
-    def __init__(self):
+    def __init__(self, redis_client=None):
         self.groq_api_key = os.getenv("GROQ_API_KEY")
         
         if not self.groq_api_key or self.groq_api_key == "your_groq_api_key_here":
@@ -34,54 +47,80 @@ class TokenTrustOrchestrator:
                 "Please set your Groq API key in the .env file."
             )
         
-        self.llm = ChatGroq(
-            temperature=0.1,
-            model_name="llama-3.3-70b-versatile",
-            api_key=self.groq_api_key
-        )
-        
-        # Initialize specialized agents
-        self.risk_agent = RiskAgent()
-        self.token_manager = TokenManager()
-        self.merchant_communicator = MerchantCommunicator()
-        self.verification_agent = VerificationAgent()
+        # Optional shared async Redis client, also handed to the agents
+        self.redis_client = redis_client
         
         # Active sessions tracking
         self.active_sessions = {}
         
         # Simple conversation context (instead of LangChain memory)
         self.conversation_context = {}
+        
+        # In-flight process_transaction tasks, cancelled on shutdown
+        self._tasks: Set[asyncio.Task] = set()
+    
+    # The LLM client and specialized agents are built on first use so that
+    # startup (and low-risk requests) don't pay for clients they never touch
+    @cached_property
+    def llm(self) -> ChatGroq:
+        return get_llm(0.1)
+    
+    @cached_property
+    def risk_agent(self) -> RiskAgent:
+        return RiskAgent()
+    
+    @cached_property
+    def token_manager(self) -> TokenManager:
+        return TokenManager()
+    
+    @cached_property
+    def merchant_communicator(self) -> MerchantCommunicator:
+        return MerchantCommunicator(redis_client=self.redis_client)
+    
+    @cached_property
+    def verification_agent(self) -> VerificationAgent:
+        return VerificationAgent(redis_client=self.redis_client)
     
     async def process_transaction(self, transaction_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Main entry point for processing a transaction through the complete workflow
         """
-        session_id = str(uuid.uuid4())
+        session_id = uuid.uuid4().hex
+        short_id = session_id[:8]
+        
+        task = asyncio.current_task()
+        if task is not None:
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
         
         try:
             # Step 1: Initial Risk Assessment
-            print(f"🔍 [Session {session_id[:8]}] Starting risk assessment...")
-            risk_result = await self._assess_risk(transaction_data, session_id)
+            logger.info("[Session %s] Starting risk assessment...", short_id)
+            risk_result = await self._assess_risk(transaction_data, short_id)
             
             # Store session data
-            self.active_sessions[session_id] = {
+            session = {
+                "short_id": short_id,
                 "transaction_data": transaction_data,
                 "risk_result": risk_result,
                 "status": "risk_assessed",
                 "created_at": datetime.now(),
                 "steps": [{"step": "risk_assessment", "result": risk_result, "timestamp": datetime.now()}]
             }
+            self.active_sessions[session_id] = session
+            await self._persist_session(session_id)
             
             # Step 2: Decision Making based on Risk Score
-            decision_result = await self._make_decision(risk_result, session_id)
+            decision_result = await self._make_decision(risk_result, short_id)
             
             # Update session
-            self.active_sessions[session_id]["decision"] = decision_result
-            self.active_sessions[session_id]["steps"].append({
+            session["decision"] = decision_result
+            session["steps"].append({
                 "step": "decision_making", 
                 "result": decision_result, 
                 "timestamp": datetime.now()
             })
+            await self._persist_session(session_id)
             
             # Step 3: Execute Action based on Decision
             if decision_result["action"] == "APPROVE":
@@ -94,13 +133,13 @@ class TokenTrustOrchestrator:
                 final_result = {"status": "error", "message": "Unknown action"}
             
             # Final session update
-            self.active_sessions[session_id]["final_result"] = final_result
-            self.active_sessions[session_id]["status"] = "completed"
-            self.active_sessions[session_id]["steps"].append({
+            session.update({"final_result": final_result, "status": "completed"})
+            session["steps"].append({
                 "step": "final_action", 
                 "result": final_result, 
                 "timestamp": datetime.now()
             })
+            await self._persist_session(session_id)
             
             return {
                 "session_id": session_id,
@@ -108,7 +147,7 @@ class TokenTrustOrchestrator:
                 "risk_assessment": risk_result,
                 "decision": decision_result,
                 "final_result": final_result,
-                "workflow_steps": self.active_sessions[session_id]["steps"]
+                "workflow_steps": session["steps"]
             }
             
         except Exception as e:
@@ -119,30 +158,30 @@ class TokenTrustOrchestrator:
             }
             
             if session_id in self.active_sessions:
-                self.active_sessions[session_id]["status"] = "error"
-                self.active_sessions[session_id]["error"] = str(e)
+                self.active_sessions[session_id].update({"status": "error", "error": str(e)})
+                await self._persist_session(session_id)
             
             return error_result
     
-    async def _assess_risk(self, transaction_data: Dict[str, Any], session_id: str) -> Dict[str, Any]:
+    async def _assess_risk(self, transaction_data: Dict[str, Any], short_id: str) -> Dict[str, Any]:
         """Step 1: Assess transaction risk using the RiskAgent"""
         try:
-            risk_result = self.risk_agent.analyze_risk(transaction_data)
+            risk_result = await self.risk_agent.analyze_risk_async(transaction_data)
             
-            print(f"📊 [Session {session_id[:8]}] Risk Score: {risk_result['risk_score']}/100")
-            print(f"📋 [Session {session_id[:8]}] Decision: {risk_result['decision']}")
+            logger.info("[Session %s] Risk Score: %s/100", short_id, risk_result['risk_score'])
+            logger.info("[Session %s] Decision: %s", short_id, risk_result['decision'])
             
             return risk_result
             
         except Exception as e:
-            print(f"❌ [Session {session_id[:8]}] Risk assessment failed: {str(e)}")
+            logger.error("[Session %s] Risk assessment failed: %s", short_id, e)
             return {
                 "risk_score": 75,  # Default to high caution
                 "decision": "CHALLENGE",
                 "explanation": f"Risk assessment failed: {str(e)}"
             }
     
-    async def _make_decision(self, risk_result: Dict[str, Any], session_id: str) -> Dict[str, Any]:
+    async def _make_decision(self, risk_result: Dict[str, Any], short_id: str) -> Dict[str, Any]:
         """Step 2: Make decision based on risk score using AI agent"""
         
         decision_prompt = f"""
@@ -168,19 +207,19 @@ class TokenTrustOrchestrator:
         """
         
         try:
-            response = self.llm.invoke([HumanMessage(content=decision_prompt)])
+            response = await llm_breaker.call_async(self.llm.ainvoke, [HumanMessage(content=decision_prompt)])
             response_text = response.content if hasattr(response, 'content') else str(response)
             
             # Parse JSON response
             decision_data = json.loads(response_text.strip().replace("```json", "").replace("```", ""))
             
-            print(f"⚖️  [Session {session_id[:8]}] Decision: {decision_data['action']}")
-            print(f"💭 [Session {session_id[:8]}] Reasoning: {decision_data['reasoning']}")
+            logger.info("[Session %s] Decision: %s", short_id, decision_data['action'])
+            logger.info("[Session %s] Reasoning: %s", short_id, decision_data['reasoning'])
             
             return decision_data
             
         except Exception as e:
-            print(f"❌ [Session {session_id[:8]}] Decision making failed: {str(e)}")
+            logger.error("[Session %s] Decision making failed: %s", short_id, e)
             # Fallback decision based on risk score
             risk_score = risk_result['risk_score']
             if risk_score <= 30:
@@ -199,6 +238,7 @@ class TokenTrustOrchestrator:
     
     async def _approve_transaction(self, session_id: str) -> Dict[str, Any]:
         """Step 3a: Approve transaction (low risk)"""
+        short_id = self._short_id(session_id)
         try:
             session = self.active_sessions[session_id]
             token = session["transaction_data"].get("token")
@@ -206,7 +246,7 @@ class TokenTrustOrchestrator:
             # Keep token active
             approval_result = await self.token_manager.activate_token(token)
             
-            print(f"✅ [Session {session_id[:8]}] Transaction approved - token remains active")
+            logger.info("[Session %s] Transaction approved - token remains active", short_id)
             
             return {
                 "status": "approved",
@@ -220,13 +260,14 @@ class TokenTrustOrchestrator:
     
     async def _freeze_and_verify_workflow(self, session_id: str) -> Dict[str, Any]:
         """Step 3b: Freeze token and initiate merchant verification workflow"""
+        short_id = self._short_id(session_id)
         try:
             session = self.active_sessions[session_id]
             transaction_data = session["transaction_data"]
             token = transaction_data.get("token")
             merchant_id = transaction_data.get("merchant_id")
             
-            print(f"🧊 [Session {session_id[:8]}] Freezing token and starting verification...")
+            logger.info("[Session %s] Freezing token and starting verification...", short_id)
             
             # Step 1: Freeze the token
             freeze_result = await self.token_manager.freeze_token(token, session_id)
@@ -241,7 +282,7 @@ class TokenTrustOrchestrator:
             
             if not merchant_notification["success"]:
                 # If merchant notification fails, still proceed but log it
-                print(f"⚠️  [Session {session_id[:8]}] Merchant notification failed, but continuing...")
+                logger.warning("[Session %s] Merchant notification failed, but continuing...", short_id)
             
             # Step 3: Wait for merchant response (with timeout)
             verification_result = await self._wait_for_merchant_verification(session_id, timeout=600)  # 10 minutes
@@ -252,32 +293,33 @@ class TokenTrustOrchestrator:
             return final_decision
             
         except Exception as e:
-            print(f"❌ [Session {session_id[:8]}] Freeze and verify workflow failed: {str(e)}")
+            logger.error("[Session %s] Freeze and verify workflow failed: %s", short_id, e)
             return {"status": "error", "message": f"Verification workflow failed: {str(e)}"}
     
     async def _wait_for_merchant_verification(self, session_id: str, timeout: int = 600) -> Dict[str, Any]:
         """Wait for merchant to complete 2FA verification"""
+        short_id = self._short_id(session_id)
         start_time = datetime.now()
         check_interval = 10  # Check every 10 seconds
         
-        print(f"⏳ [Session {session_id[:8]}] Waiting for merchant verification (timeout: {timeout}s)...")
+        logger.info("[Session %s] Waiting for merchant verification (timeout: %ss)...", short_id, timeout)
         
         while (datetime.now() - start_time).seconds < timeout:
             # Check if merchant has responded
             verification_status = await self.merchant_communicator.check_verification_status(session_id)
             
             if verification_status["status"] == "completed":
-                print(f"✅ [Session {session_id[:8]}] Merchant verification completed")
+                logger.info("[Session %s] Merchant verification completed", short_id)
                 return verification_status
             elif verification_status["status"] == "failed":
-                print(f"❌ [Session {session_id[:8]}] Merchant verification failed")
+                logger.warning("[Session %s] Merchant verification failed", short_id)
                 return verification_status
             
             # Wait before next check
             await asyncio.sleep(check_interval)
         
         # Timeout reached
-        print(f"⏰ [Session {session_id[:8]}] Merchant verification timed out")
+        logger.warning("[Session %s] Merchant verification timed out", short_id)
         return {
             "status": "timeout",
             "message": "Merchant verification timed out",
@@ -287,12 +329,13 @@ class TokenTrustOrchestrator:
     async def _process_verification_result(self, session_id: str, verification_result: Dict[str, Any]) -> Dict[str, Any]:
         """Process the result of merchant verification and take final action"""
         try:
+            short_id = self._short_id(session_id)
             session = self.active_sessions[session_id]
             token = session["transaction_data"].get("token")
             
             if verification_result["status"] == "completed" and verification_result.get("verified", False):
                 # Merchant verified user - unfreeze token
-                print(f"🔓 [Session {session_id[:8]}] User verified by merchant - unfreezing token")
+                logger.info("[Session %s] User verified by merchant - unfreezing token", short_id)
                 
                 unfreeze_result = await self.token_manager.unfreeze_token(token, session_id)
                 
@@ -307,7 +350,7 @@ class TokenTrustOrchestrator:
                 
             else:
                 # Merchant could not verify user or verification failed/timed out - revoke token
-                print(f"🚫 [Session {session_id[:8]}] User not verified - revoking token")
+                logger.info("[Session %s] User not verified - revoking token", short_id)
                 
                 revoke_result = await self.token_manager.revoke_token(token, session_id, 
                     reason=verification_result.get("message", "Merchant verification failed"))
@@ -321,16 +364,17 @@ class TokenTrustOrchestrator:
                 }
                 
         except Exception as e:
-            print(f"❌ [Session {session_id[:8]}] Processing verification result failed: {str(e)}")
+            logger.error("[Session %s] Processing verification result failed: %s", self._short_id(session_id), e)
             return {"status": "error", "message": f"Failed to process verification: {str(e)}"}
     
     async def _revoke_token(self, session_id: str) -> Dict[str, Any]:
         """Step 3c: Immediately revoke token (very high risk)"""
+        short_id = self._short_id(session_id)
         try:
             session = self.active_sessions[session_id]
             token = session["transaction_data"].get("token")
             
-            print(f"🚫 [Session {session_id[:8]}] High risk detected - revoking token immediately")
+            logger.info("[Session %s] High risk detected - revoking token immediately", short_id)
             
             revoke_result = await self.token_manager.revoke_token(token, session_id, 
                 reason="High risk transaction detected")
@@ -371,12 +415,15 @@ class TokenTrustOrchestrator:
             })
             
             # Process the final result based on verification
-            final_result = await self._process_verification_result(verification_result, session_id)
+            final_result = await self._process_verification_result(session_id, verification_result)
             
             # Update final session state
-            session["final_result"] = final_result
-            session["status"] = "completed"
-            session["workflow_complete"] = True
+            session.update({
+                "final_result": final_result,
+                "status": "completed",
+                "workflow_complete": True
+            })
+            await self._persist_session(session_id)
             
             return {
                 "status": "completed",
@@ -391,21 +438,81 @@ class TokenTrustOrchestrator:
         except Exception as e:
             return {"status": "error", "message": f"Failed to handle merchant response: {str(e)}"}
 
-    def get_session_status(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """Get the current status of a session"""
-        return self.active_sessions.get(session_id)
+    def _short_id(self, session_id: str) -> str:
+        """Get the precomputed log tag for a session"""
+        session = self.active_sessions.get(session_id)
+        return session["short_id"] if session else session_id[:8]
+
+    async def _persist_session(self, session_id: str):
+        """Write the session snapshot to Redis (SETEX plus ZADD; the TTL is refreshed on every write)"""
+        if self.redis_client is None:
+            return
+        session = self.active_sessions.get(session_id)
+        if session is None:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.setex(
+                SESSION_KEY_PREFIX + session_id,
+                SESSION_TTL_SECONDS,
+                orjson.dumps(session, default=str)
+            )
+            pipe.zadd(ACTIVE_SESSIONS_KEY, {session_id: datetime.now().timestamp() + SESSION_TTL_SECONDS})
+            await pipe.execute()
+        except Exception as e:
+            logger.warning("[Session %s] Failed to persist session: %s", session.get("short_id"), e)
+
+    async def get_session_status(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get the current status of a session (local first, then the shared Redis copy)"""
+        session = self.active_sessions.get(session_id)
+        if session is not None or self.redis_client is None:
+            return session
+        try:
+            raw = await self.redis_client.get(SESSION_KEY_PREFIX + session_id)
+        except Exception as e:
+            logger.warning("Session lookup in Redis failed: %s", e)
+            return None
+        return orjson.loads(raw) if raw else None
+
+    async def count_active_sessions(self) -> int:
+        """Number of live sessions across all workers (local count without Redis)"""
+        if self.redis_client is None:
+            return len(self.active_sessions)
+        try:
+            # Drop ids whose snapshot has expired, then count the rest
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.zremrangebyscore(ACTIVE_SESSIONS_KEY, "-inf", datetime.now().timestamp())
+            pipe.zcard(ACTIVE_SESSIONS_KEY)
+            _, count = await pipe.execute()
+            return count
+        except Exception as e:
+            logger.warning("Session count from Redis failed: %s", e)
+            return len(self.active_sessions)
     
     def cleanup_old_sessions(self, max_age_hours: int = 24):
-        """Clean up old sessions to prevent memory leaks"""
+        """Clean up old sessions held in this worker's memory (the Redis copies expire on their own)"""
         cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
+        initial_count = len(self.active_sessions)
         
-        sessions_to_remove = [
-            session_id for session_id, session_data in self.active_sessions.items()
-            if session_data.get("created_at", cutoff_time) < cutoff_time
-        ]
+        # Sessions without a created_at are treated as expired; rebuilding the
+        # dict is cheaper than deleting entries one by one
+        self.active_sessions = {
+            session_id: session_data for session_id, session_data in self.active_sessions.items()
+            if session_data.get("created_at", datetime.min) >= cutoff_time
+        }
         
-        for session_id in sessions_to_remove:
-            del self.active_sessions[session_id]
-            
-        if sessions_to_remove:
-            print(f"🧹 Cleaned up {len(sessions_to_remove)} old sessions")
\ No newline at end of file
+        removed_count = initial_count - len(self.active_sessions)
+        if removed_count:
+            logger.info("Cleaned up %d old sessions", removed_count)
+    
+    async def shutdown(self):
+        """Cancel in-flight workflows so pending verification waits don't block shutdown"""
+        current = asyncio.current_task()
+        tasks = [task for task in self._tasks if task is not current]
+        
+        for task in tasks:
+            task.cancel()
+        
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            logger.info("Cancelled %d in-flight sessions on shutdown", len(tasks))
@@ -1,78 +1,199 @@
 import os
-import json
+import logging
+import logging.handlers
+import queue
+from contextlib import asynccontextmanager
 from datetime import datetime
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
-import os
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict
+from typing import Optional, Dict, Any, List, Tuple
 import asyncio
+from operator import itemgetter
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import MongoClient, WriteConcern
 import redis
+import redis.asyncio as aioredis
+from motor.motor_asyncio import AsyncIOMotorClient
+import msgpack
+import orjson
 from agents.risk_agent import AgenticRiskAgent  # <-- agentic AI
-import json
-from datetime import datetime
 
 # Import robust endpoints
 from endpoints import router as robust_router
+from helpers import close_audit_log
 
-# Import legacy agents
-from agents.risk_agent import RiskAgent
+# Import agentic orchestrator
 from agents.token_trust_orchestrator import TokenTrustOrchestrator
+from clients import (
+    MONGO_APP_NAME,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
+    close_clients,
+)
+from clock import now_iso
 
 # Load environment variables
 load_dotenv()
 
+# Request handlers only enqueue log records; a listener thread does the
+# formatting and the blocking stream write. Installed by the lifespan hook, so
+# importing app (tests, tooling) leaves the root logger alone
+_log_queue = queue.SimpleQueue()
+_log_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+log_listener = logging.handlers.QueueListener(_log_queue, _log_stream_handler)
+
+# uvicorn's handler-owning loggers; "uvicorn.error" propagates to "uvicorn"
+UVICORN_LOGGERS = ("uvicorn", "uvicorn.access")
+
+def start_logging():
+    """Route root and uvicorn logging through the queue and start the listener"""
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), handlers=[_log_queue_handler])
+    # uvicorn installs its own stream handlers before startup; swap them for the queue
+    for name in UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        if uvicorn_logger.handlers:
+            uvicorn_logger.handlers = [_log_queue_handler]
+    log_listener.start()
+
+logger = logging.getLogger(__name__)
+
+# Supports the per-token history lookups in get_user_profile
+RISK_LOG_INDEX = [("token", 1), ("timestamp", -1)]
+
+async def ensure_risk_log_index():
+    """Create the risk log index at startup; failure only costs profile-lookup speed"""
+    if not mongo_enabled or mongo_async_client is None:
+        return
+    try:
+        await mongo_async_client["risk_checker"]["risk_logs"].create_index(RISK_LOG_INDEX)
+    except Exception as e:
+        logger.warning("Could not create risk log index: %s", e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_logging()
+    await ensure_risk_log_index()
+    start_risk_log_writer()
+    yield
+    # Cancel in-flight agentic workflows so workers can exit promptly
+    await orchestrator.shutdown()
+    # Flush buffered risk logs before the worker exits
+    await stop_risk_log_writer()
+    # Write out audit entries still waiting for their batch (and their spill)
+    close_audit_log()
+    await close_clients()
+    if mongo_async_client is not None:
+        mongo_async_client.close()
+    if async_redis_client is not None:
+        await async_redis_client.aclose()
+        await async_redis_binary_client.aclose()
+    log_listener.stop()
+
 app = FastAPI(
     title="TokenTrust Risk Service - Robust Edition", 
     version="2.0.0",
-    description="Production-ready TokenTrust with canonical thresholds, idempotent operations, and proper audit logging"
+    description="Production-ready TokenTrust with canonical thresholds, idempotent operations, and proper audit logging",
+    lifespan=lifespan,
+    # Encode every response body with orjson instead of the stdlib json module
+    default_response_class=ORJSONResponse
 )
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+# CORS middleware (settings built once at import). Set CORS_ALLOWED_ORIGINS to
+# a comma-separated list to restrict origins; unset keeps the permissive
+# wildcard used by the local demos. Credentials are only allowed for an
+# explicit origin list, never together with the wildcard.
+ALLOWED_ORIGINS = frozenset(
+    origin.strip()
+    for origin in os.getenv("CORS_ALLOWED_ORIGINS", "*").split(",")
+    if origin.strip()
 )
+CORS_CONFIG = {
+    "allow_origins": sorted(ALLOWED_ORIGINS),
+    "allow_credentials": "*" not in ALLOWED_ORIGINS,
+    "allow_methods": ["GET", "POST"],
+    "allow_headers": ["Content-Type", "Authorization"],
+    # Let browsers cache preflight results for a day
+    "max_age": 86400,
+}
+app.add_middleware(CORSMiddleware, **CORS_CONFIG)
 
 # Include the robust endpoints under /v2 prefix
 app.include_router(robust_router, prefix="/v2", tags=["Robust API v2"])
 
 # Initialize MongoDB (optional for logging)
 try:
-    mongo_client = MongoClient(os.getenv("MONGO_URI"), serverSelectionTimeoutMS=2000)
+    mongo_client = MongoClient(
+        os.getenv("MONGO_URI"),
+        serverSelectionTimeoutMS=2000,
+        appname=MONGO_APP_NAME
+    )
     db = mongo_client["risk_checker"]
     risk_logs_collection = db["risk_logs"]
+    # Non-blocking client for request handlers; the sync client above only
+    # gates whether logging is enabled (neither connects until first use)
+    mongo_async_client = AsyncIOMotorClient(
+        os.getenv("MONGO_URI"),
+        serverSelectionTimeoutMS=2000,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        appname=MONGO_APP_NAME
+    )
+    # Risk logs are best-effort telemetry: unacknowledged writes (w=0) don't
+    # wait for the primary. Reads (profile aggregation) are unaffected.
+    async_risk_logs_collection = mongo_async_client["risk_checker"].get_collection(
+        "risk_logs", write_concern=WriteConcern(w=0)
+    )
     mongo_enabled = True
 except:
-    print("⚠️  MongoDB not connected - running without logging")
+    logger.warning("MongoDB not connected - running without logging")
     mongo_enabled = False
     risk_logs_collection = None
+    mongo_async_client = None
+    async_risk_logs_collection = None
 
 # Initialize Redis (optional for device history)
 try:
     redis_client = redis.Redis.from_url(os.getenv("REDIS_URL"), socket_connect_timeout=2, decode_responses=True)
     redis_client.ping()
+    # Non-blocking clients for request handlers and the agents (the sync client
+    # only probes the connection); the binary one skips response decoding for msgpack values
+    redis_pool_options = {
+        "socket_connect_timeout": 2,
+        "socket_keepalive": True,
+        "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
+        "max_connections": REDIS_MAX_CONNECTIONS,
+    }
+    async_redis_client = aioredis.from_url(os.getenv("REDIS_URL"), decode_responses=True, **redis_pool_options)
+    async_redis_binary_client = aioredis.from_url(os.getenv("REDIS_URL"), **redis_pool_options)
     redis_enabled = True
 except:
-    print("⚠️  Redis not connected - running without device history")
+    logger.warning("Redis not connected - running without device history")
     redis_enabled = False
     redis_client = None
+    async_redis_client = None
+    async_redis_binary_client = None
 
-# Initialize Agentic Risk Agent
+# Initialize Agentic Risk Agent (one per worker; loads agent memory from disk once)
 risk_agent = AgenticRiskAgent(memory_path="agent_memory.json")
-# Initialize Risk Agent
-risk_agent = RiskAgent()
 
 # Initialize TokenTrust Orchestrator (Agentic AI System)
-orchestrator = TokenTrustOrchestrator()
+orchestrator = TokenTrustOrchestrator(redis_client=async_redis_client)
 
 # Pydantic Models
+# Request bodies are validated once by pydantic-core and never mutated afterwards
+_REQUEST_MODEL_CONFIG = ConfigDict(extra="ignore", frozen=True)
+
 class SecurityContext(BaseModel):
+    model_config = _REQUEST_MODEL_CONFIG
+
     token_age_minutes: Optional[int] = None
     device_trust_score: Optional[int] = None
     usual_location: Optional[str] = None
@@ -86,6 +207,8 @@ class SecurityContext(BaseModel):
     rushed_transaction: Optional[bool] = None
 
 class RiskCheckRequest(BaseModel):
+    model_config = _REQUEST_MODEL_CONFIG
+
     token: str
     merchant_id: str
     amount: float
@@ -93,6 +216,8 @@ class RiskCheckRequest(BaseModel):
 
 # New models for Agentic AI System
 class TokenTrustRequest(BaseModel):
+    model_config = _REQUEST_MODEL_CONFIG
+
     token: str
     merchant_id: str
     amount: float
@@ -101,6 +226,8 @@ class TokenTrustRequest(BaseModel):
     transaction_metadata: Optional[Dict[str, Any]] = None
 
 class MerchantVerificationResponse(BaseModel):
+    model_config = _REQUEST_MODEL_CONFIG
+
     session_id: str
     verified: bool
     verified_by: str
@@ -108,18 +235,20 @@ class MerchantVerificationResponse(BaseModel):
     notes: Optional[str] = None
 
 class SessionStatusResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     session_id: str
     status: str
     current_step: Optional[str] = None
 
 # Helper Functions
-def get_device_history(device_id: str) -> Dict[str, Any]:
+async def get_device_history(device_id: str) -> Dict[str, Any]:
     """Get device history from Redis cache"""
-    if not redis_enabled or redis_client is None:
+    if not redis_enabled or async_redis_client is None:
         return {"seen_count": 0}
     try:
         device_key = f"device:{device_id}"
-        device_data = redis_client.hgetall(device_key)
+        device_data = await async_redis_client.hgetall(device_key)
         if device_data:
             return {
                 "seen_count": int(device_data.get("seen_count", 0)),
@@ -129,42 +258,258 @@ def get_device_history(device_id: str) -> Dict[str, Any]:
             }
         return {"seen_count": 0}
     except Exception as e:
-        print(f"Redis error: {str(e)}")
+        logger.warning("Redis error: %s", e)
         return {"seen_count": 0}
 
-def update_device_history(device_id: str, ip_address: str, geo_location: str, amount: float):
+async def update_device_history(device_id: str, ip_address: str, geo_location: str, amount: float):
     """Update device history in Redis"""
-    if not redis_enabled or redis_client is None:
+    if not redis_enabled or async_redis_client is None:
         return
     try:
         device_key = f"device:{device_id}"
-        current_count = int(redis_client.hget(device_key, "seen_count") or 0)
-        current_amount = float(redis_client.hget(device_key, "total_amount") or 0)
-        redis_client.hset(device_key, mapping={
-            "seen_count": current_count + 1,
+        # Increment server-side in one MULTI/EXEC round trip so concurrent
+        # updates for the same device can't overwrite each other
+        pipe = async_redis_client.pipeline(transaction=True)
+        pipe.hincrby(device_key, "seen_count", 1)
+        pipe.hincrbyfloat(device_key, "total_amount", amount)
+        pipe.hset(device_key, mapping={
             "last_ip": ip_address,
-            "last_geo": geo_location,
-            "total_amount": current_amount + amount
+            "last_geo": geo_location
         })
-        redis_client.expire(device_key, 86400 * 30)  # 30 days expiry
+        pipe.expire(device_key, 86400 * 30)  # 30 days expiry
+        await pipe.execute()
+    except Exception as e:
+        logger.warning("Redis update error: %s", e)
+
+# Aggregation over a token's most recent risk logs; Mongo computes the
+# profile statistics so only one summary document comes back
+USER_PROFILE_HISTORY_LIMIT = 50
+# Profiles are cached in Redis briefly and invalidated whenever a new log is written
+USER_PROFILE_CACHE_TTL_SECONDS = 60
+
+def _user_profile_pipeline(token: str) -> list:
+    return [
+        {"$match": {"token": token}},
+        {"$sort": {"timestamp": -1}},
+        {"$limit": USER_PROFILE_HISTORY_LIMIT},
+        {"$facet": {
+            "stats": [{"$group": {
+                "_id": None,
+                "count": {"$sum": 1},
+                "avg_amount": {"$avg": "$amount"},
+                "min_amount": {"$min": "$amount"},
+                "max_amount": {"$max": "$amount"},
+                "avg_device_trust": {"$avg": "$security_context.device_trust_score"},
+                "high_risk_count": {"$sum": {"$cond": [{"$eq": ["$risk_level", "HIGH"]}, 1, 0]}},
+                "vpn_any": {"$max": {"$cond": ["$security_context.vpn_detected", 1, 0]}}
+            }}],
+            "top_merchants": [{"$sortByCount": "$merchant_id"}, {"$limit": 5}],
+            "top_locations": [{"$sortByCount": "$security_context.current_location"}, {"$limit": 3}],
+            "recent": [{"$limit": 5}, {"$project": {"_id": 0, "risk_score": 1}}]
+        }}
+    ]
+
+def _build_user_profile(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Shape the aggregation result into the profile the risk prompt expects"""
+    stats = result["stats"][0]
+    avg_device_trust = stats.get("avg_device_trust")
+    return {
+        "is_first_transaction": False,
+        "total_transactions": stats["count"],
+        "avg_amount": round(stats.get("avg_amount") or 0, 2),
+        "min_amount": stats.get("min_amount"),
+        "max_amount": stats.get("max_amount"),
+        "typical_merchants": [m["_id"] for m in result["top_merchants"] if m["_id"]],
+        "typical_locations": [l["_id"] for l in result["top_locations"] if l["_id"]],
+        "avg_device_trust": round(avg_device_trust) if avg_device_trust is not None else None,
+        "vpn_usage_history": bool(stats.get("vpn_any")),
+        "high_risk_count": stats.get("high_risk_count", 0),
+        "recent_risk_scores": [r["risk_score"] for r in result["recent"] if "risk_score" in r]
+    }
+
+def _user_profile_key(token: str) -> str:
+    return f"profile:{token}"
+
+async def save_risk_logs(log_entries: List[Dict[str, Any]]):
+    """Persist risk log entries in one bulk insert and drop their tokens' cached profiles
+    so the next read reflects the newly logged transactions"""
+    try:
+        await async_risk_logs_collection.insert_many(log_entries, ordered=False)
+    except Exception as e:
+        logger.error("Error saving logs: %s", e)
+    if redis_enabled and async_redis_client is not None:
+        try:
+            await async_redis_client.delete(*{_user_profile_key(entry["token"]) for entry in log_entries})
+        except Exception as e:
+            logger.warning("Redis error: %s", e)
+
+# Risk logs are buffered in memory and written to MongoDB in batches by a
+# background task, so request handlers never wait on a Mongo round trip
+RISK_LOG_BATCH_SIZE = 100
+RISK_LOG_FLUSH_INTERVAL_SECONDS = 0.2
+
+risk_log_queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+_risk_log_writer_task: Optional[asyncio.Task] = None
+
+async def _risk_log_writer():
+    """Drain risk_log_queue, writing up to RISK_LOG_BATCH_SIZE entries per insert_many"""
+    loop = asyncio.get_running_loop()
+    stopping = False
+    while not stopping:
+        entry = await risk_log_queue.get()
+        if entry is None:
+            break
+        batch = [entry]
+        deadline = loop.time() + RISK_LOG_FLUSH_INTERVAL_SECONDS
+        while len(batch) < RISK_LOG_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                entry = await asyncio.wait_for(risk_log_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if entry is None:
+                stopping = True
+                break
+            batch.append(entry)
+        await save_risk_logs(batch)
+
+def start_risk_log_writer():
+    global _risk_log_writer_task
+    if mongo_enabled and _risk_log_writer_task is None:
+        _risk_log_writer_task = asyncio.create_task(_risk_log_writer())
+
+async def stop_risk_log_writer():
+    """Flush whatever is queued and stop the writer task"""
+    global _risk_log_writer_task
+    if _risk_log_writer_task is None:
+        return
+    risk_log_queue.put_nowait(None)
+    await _risk_log_writer_task
+    _risk_log_writer_task = None
+
+async def enqueue_risk_log(log_entry: Dict[str, Any]):
+    """Hand a risk log entry to the batch writer (or write it directly if the writer isn't running)"""
+    await enqueue_risk_logs([log_entry])
+
+async def enqueue_risk_logs(log_entries: List[Dict[str, Any]]):
+    """Hand several risk log entries to the batch writer; without the writer they go out in one insert_many"""
+    if _risk_log_writer_task is None:
+        await save_risk_logs(log_entries)
+        return
+    for log_entry in log_entries:
+        risk_log_queue.put_nowait(log_entry)
+
+async def get_user_profile(token: str) -> Dict[str, Any]:
+    """Build the user's behavioral profile from their transaction history in MongoDB"""
+    first_transaction_profile = {"is_first_transaction": True, "total_transactions": 0}
+    if not mongo_enabled or async_risk_logs_collection is None:
+        return first_transaction_profile
+    
+    if redis_enabled and async_redis_binary_client is not None:
+        try:
+            cached = await async_redis_binary_client.get(_user_profile_key(token))
+            if cached:
+                return msgpack.unpackb(cached, raw=False)
+        except Exception as e:
+            logger.warning("Redis error: %s", e)
+    
+    try:
+        results = await async_risk_logs_collection.aggregate(_user_profile_pipeline(token)).to_list(length=1)
+        result = results[0] if results else None
+        if not result or not result["stats"]:
+            profile = first_transaction_profile
+        else:
+            profile = _build_user_profile(result)
     except Exception as e:
-        print(f"Redis update error: {str(e)}")
+        logger.error("Error building user profile: %s", e)
+        return first_transaction_profile
+    
+    if redis_enabled and async_redis_binary_client is not None:
+        try:
+            await async_redis_binary_client.setex(_user_profile_key(token), USER_PROFILE_CACHE_TTL_SECONDS,
+                                      msgpack.packb(profile))
+        except Exception as e:
+            logger.warning("Redis error: %s", e)
+    return profile
+
+# Upper bound on /risk-check/batch size; every item is scored concurrently
+RISK_CHECK_BATCH_MAX_SIZE = 100
 
 # Risk level determination
-def get_risk_level(risk_score: int) -> str:
-    """Convert risk score to risk level"""
-    if risk_score < 30:
-        return "LOW"
-    elif risk_score < 70:
-        return "MEDIUM"
-    else:
-        return "HIGH"
+# (risk_level, token_valid) indexed by how many of the thresholds (30, 70)
+# the score has reached; unlike risk_score // 10 this also holds for float
+# and out-of-range scores returned by the LLM
+_RISK_LEVEL_RESULTS = (("LOW", True), ("MEDIUM", True), ("HIGH", False))
+
+def get_risk_level_and_validity(risk_score: int) -> Tuple[str, bool]:
+    """Convert risk score to (risk level, whether the token stays valid)"""
+    return _RISK_LEVEL_RESULTS[(risk_score >= 30) + (risk_score >= 70)]
 
 # API Routes
 @app.get("/")
 def read_root():
     return {"message": "Risk Checker Service is running", "version": "1.0.0"}
 
+# Security context fields forwarded to the risk agent by /risk-check
+_RISK_CHECK_CONTEXT_FIELDS = (
+    "token_age_minutes",
+    "device_trust_score",
+    "usual_location",
+    "current_location",
+    "new_device",
+    "vpn_detected",
+    "unusual_time",
+    "rushed_transaction",
+)
+_risk_check_context_values = itemgetter(*_RISK_CHECK_CONTEXT_FIELDS)
+
+def _risk_check_transaction_data(request: RiskCheckRequest, ctx_dict: Dict[str, Any]) -> Dict[str, Any]:
+    # Every request dict gets the same keys in the same order; the context
+    # values are pulled in one C-level itemgetter call
+    transaction_data = {
+        "token": request.token,
+        "merchant_id": request.merchant_id,
+        "amount": request.amount,
+    }
+    transaction_data.update(zip(_RISK_CHECK_CONTEXT_FIELDS, _risk_check_context_values(ctx_dict)))
+    return transaction_data
+
+async def _run_risk_check(request: RiskCheckRequest) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """Score one risk-check request; returns the response body and its MongoDB log entry (if logging)"""
+    # Dumped once and shared by the agent input and the log entry
+    ctx_dict = request.security_context.model_dump()
+
+    # Agentic risk analysis (awaited so the LLM call doesn't block the event loop)
+    result = await risk_agent.analyze_risk_async(_risk_check_transaction_data(request, ctx_dict))
+
+    # Compute risk level and token validity
+    risk_level, token_valid = get_risk_level_and_validity(result["risk_score"])
+
+    # pymongo Collection objects don't implement truth-value testing; compare to None explicitly
+    log_entry = None
+    if mongo_enabled and risk_logs_collection is not None:
+        log_entry = {
+            "token": request.token,
+            "merchant_id": request.merchant_id,
+            "amount": request.amount,
+            "security_context": ctx_dict,
+            "risk_score": result["risk_score"],
+            "risk_level": risk_level,
+            "token_valid": token_valid,
+            "timestamp": datetime.utcnow()
+        }
+
+    response = {
+        "risk_level": risk_level,
+        "token_valid": token_valid,
+        "reasoning": result["explanation"],
+        "risk_score": result["risk_score"],
+        "timestamp": now_iso()
+    }
+    return response, log_entry
+
 @app.post("/risk-check")
 async def check_risk(request: RiskCheckRequest):
     """
@@ -173,56 +518,40 @@ async def check_risk(request: RiskCheckRequest):
     Learns from user's transaction history to detect anomalies
     """
     try:
-        ctx = request.security_context
-        transaction_data = {
-            "token": request.token,
-            "merchant_id": request.merchant_id,
-            "amount": request.amount,
-            "token_age_minutes": ctx.token_age_minutes,
-            "device_trust_score": ctx.device_trust_score,
-            "usual_location": ctx.usual_location,
-            "current_location": ctx.current_location,
-            "new_device": ctx.new_device,
-            "vpn_detected": ctx.vpn_detected,
-            "unusual_time": ctx.unusual_time,
-            "rushed_transaction": ctx.rushed_transaction,
-        }
+        response, log_entry = await _run_risk_check(request)
 
-        # Agentic risk analysis
-        result = risk_agent.analyze_risk(transaction_data)
+        # Optional logging to MongoDB, written in the background by the batch writer
+        if log_entry is not None:
+            await enqueue_risk_log(log_entry)
 
-        # Compute risk level and token validity
-        risk_level = get_risk_level(result["risk_score"])
-        token_valid = risk_level != "HIGH"
+        return response
 
-        # Optional logging to MongoDB
-        # pymongo Collection objects don't implement truth-value testing; compare to None explicitly
-        if mongo_enabled and risk_logs_collection is not None:
-            try:
-                log_entry = {
-                    "token": request.token,
-                    "merchant_id": request.merchant_id,
-                    "amount": request.amount,
-                    "security_context": ctx.dict(),
-                    "risk_score": result["risk_score"],
-                    "risk_level": risk_level,
-                    "token_valid": token_valid,
-                    "timestamp": datetime.utcnow()
-                }
-                risk_logs_collection.insert_one(log_entry)
-            except Exception as e:
-                print(f"Error saving log: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Risk check failed: {str(e)}")
 
-        return {
-            "risk_level": risk_level,
-            "token_valid": token_valid,
-            "reasoning": result["explanation"],
-            "risk_score": result["risk_score"],
-            "timestamp": datetime.utcnow().isoformat()
-        }
+@app.post("/risk-check/batch")
+async def check_risk_batch(batch: List[RiskCheckRequest]):
+    """
+    Bulk variant of /risk-check for analytics and backfills.
+    All transactions are scored concurrently and their logs handed to the batch writer;
+    results are returned in request order.
+    """
+    if len(batch) > RISK_CHECK_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: {len(batch)} requests (max {RISK_CHECK_BATCH_MAX_SIZE})"
+        )
+    try:
+        scored = await asyncio.gather(*(_run_risk_check(r) for r in batch))
+
+        log_entries = [log_entry for _, log_entry in scored if log_entry is not None]
+        if log_entries:
+            await enqueue_risk_logs(log_entries)
+
+        return {"results": [response for response, _ in scored], "count": len(scored)}
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Risk check failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch risk check failed: {str(e)}")
 
 # New Agentic AI Endpoints for TokenTrust System
 
@@ -239,31 +568,24 @@ async def process_transaction_with_ai(request: TokenTrustRequest):
     """
     try:
         # Get user profile for enhanced analysis
-        user_profile = get_user_profile(request.token)
+        user_profile = await get_user_profile(request.token)
         
-        # Prepare comprehensive transaction data
+        # Prepare comprehensive transaction data (the full security context,
+        # dumped once and reused for the log entry)
+        ctx_dict = request.security_context.model_dump()
         transaction_data = {
             "token": request.token,
             "merchant_id": request.merchant_id,
             "amount": request.amount,
-            "token_age_minutes": request.security_context.token_age_minutes,
-            "device_trust_score": request.security_context.device_trust_score,
-            "usual_location": request.security_context.usual_location,
-            "current_location": request.security_context.current_location,
-            "user_history": request.security_context.user_history,
-            "recent_transactions": request.security_context.recent_transactions,
-            "user_avg_amount": request.security_context.user_avg_amount,
-            "new_device": request.security_context.new_device,
-            "vpn_detected": request.security_context.vpn_detected,
-            "unusual_time": request.security_context.unusual_time,
-            "rushed_transaction": request.security_context.rushed_transaction,
+            **ctx_dict,
             "user_profile": user_profile,
             "user_info": request.user_info,
             "transaction_metadata": request.transaction_metadata
         }
         
         # Process through the complete agentic workflow
-        print(f"🚀 Starting TokenTrust AI processing for token {request.token[:8]}...")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Starting TokenTrust AI processing for token %s...", request.token[:8])
         result = await orchestrator.process_transaction(transaction_data)
         
         # Save detailed log to MongoDB
@@ -274,15 +596,16 @@ async def process_transaction_with_ai(request: TokenTrustRequest):
                     "token": request.token,
                     "merchant_id": request.merchant_id,
                     "amount": request.amount,
-                    "security_context": request.security_context.dict(),
+                    "security_context": ctx_dict,
                     "agentic_result": result,
                     "timestamp": datetime.utcnow(),
                     "workflow_type": "agentic_tokentrust"
                 }
-                risk_logs_collection.insert_one(log_entry)
-                print(f"📝 Logged agentic processing for session {result.get('session_id', 'unknown')[:8]}")
+                await enqueue_risk_log(log_entry)
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("Queued agentic processing log for session %s", (result.get("session_id") or "unknown")[:8])
             except Exception as e:
-                print(f"Warning: Failed to log agentic result: {str(e)}")
+                logger.warning("Failed to log agentic result: %s", e)
         
         # Build response based on decision action
         decision_action = result.get("decision", {}).get("action")
@@ -292,7 +615,7 @@ async def process_transaction_with_ai(request: TokenTrustRequest):
             "risk_assessment": result.get("risk_assessment"),
             "decision_reasoning": result.get("decision", {}).get("reasoning"),
             "processing_time": len(result.get("workflow_steps", [])),
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": now_iso()
         }
         
         # Only include final_status and token_status for completed workflows
@@ -322,7 +645,7 @@ async def process_transaction_with_ai(request: TokenTrustRequest):
         return response_data
         
     except Exception as e:
-        print(f"❌ TokenTrust processing failed: {str(e)}")
+        logger.error("TokenTrust processing failed: %s", e)
         raise HTTPException(
             status_code=500, 
             detail=f"TokenTrust agentic processing failed: {str(e)}"
@@ -345,7 +668,8 @@ async def submit_merchant_verification(response: MerchantVerificationResponse):
         )
         
         if result["status"] == "completed":
-            print(f"✅ Merchant verification completed for session {response.session_id[:8]}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Merchant verification completed for session %s", response.session_id[:8])
             return {
                 "success": True,
                 "session_id": response.session_id,
@@ -355,13 +679,13 @@ async def submit_merchant_verification(response: MerchantVerificationResponse):
                 "message": result.get("message"),
                 "workflow_complete": True,
                 "verification_successful": result.get("verification_successful"),
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": now_iso()
             }
         else:
             raise HTTPException(status_code=400, detail=result.get("message", "Verification processing failed"))
             
     except Exception as e:
-        print(f"❌ Merchant response submission failed: {str(e)}")
+        logger.error("Merchant response submission failed: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to submit merchant response: {str(e)}"
@@ -373,7 +697,7 @@ async def get_session_status(session_id: str):
     Get the current status of a TokenTrust processing session
     """
     try:
-        session_data = orchestrator.get_session_status(session_id)
+        session_data = await orchestrator.get_session_status(session_id)
         
         if not session_data:
             raise HTTPException(status_code=404, detail="Session not found")
@@ -387,13 +711,13 @@ async def get_session_status(session_id: str):
             "decision": session_data.get("decision", {}).get("action"),
             "final_result": session_data.get("final_result"),
             "workflow_steps": len(session_data.get("steps", [])),
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": now_iso()
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Session status retrieval failed: {str(e)}")
+        logger.error("Session status retrieval failed: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to retrieve session status: {str(e)}"
@@ -405,24 +729,18 @@ async def get_merchant_verifications(merchant_id: str):
     Get pending verifications for a specific merchant
     """
     try:
-        pending_verifications = orchestrator.merchant_communicator.get_pending_verifications()
-        
-        # Filter for specific merchant
-        merchant_verifications = {
-            session_id: verification 
-            for session_id, verification in pending_verifications.items()
-            if verification.get("merchant_id") == merchant_id
-        }
+        # Indexed by merchant, so this doesn't scan every pending verification
+        merchant_verifications = await orchestrator.merchant_communicator.get_merchant_verifications(merchant_id)
         
         return {
             "merchant_id": merchant_id,
             "pending_verifications": len(merchant_verifications),
             "verifications": merchant_verifications,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": now_iso()
         }
         
     except Exception as e:
-        print(f"❌ Merchant verification retrieval failed: {str(e)}")
+        logger.error("Merchant verification retrieval failed: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to retrieve merchant verifications: {str(e)}"
@@ -437,8 +755,8 @@ async def get_tokentrust_analytics():
         # Get verification analytics
         verification_analytics = orchestrator.verification_agent.get_verification_analytics()
         
-        # Get active sessions count
-        active_sessions = len(orchestrator.active_sessions)
+        # Get active sessions count (shared across workers when Redis is available)
+        active_sessions = await orchestrator.count_active_sessions()
         
         return {
             "system_status": "operational",
@@ -451,11 +769,11 @@ async def get_tokentrust_analytics():
                 "verification_agent": "active",
                 "orchestrator": "active"
             },
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": now_iso()
         }
         
     except Exception as e:
-        print(f"❌ Analytics retrieval failed: {str(e)}")
+        logger.error("Analytics retrieval failed: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to retrieve analytics: {str(e)}"
@@ -478,46 +796,50 @@ async def cleanup_old_sessions(max_age_hours: int = 24):
             "sessions_cleaned": cleaned_count,
             "active_sessions_remaining": final_count,
             "max_age_hours": max_age_hours,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": now_iso()
         }
         
     except Exception as e:
-        print(f"❌ Session cleanup failed: {str(e)}")
+        logger.error("Session cleanup failed: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to cleanup sessions: {str(e)}"
         )
 
+# The health payload only depends on connection state decided at import,
+# so it is serialized once and served as raw bytes on every probe
+_HEALTH_BYTES = orjson.dumps({
+    "status": "healthy",
+    "service": "TokenTrust Agentic AI Risk Service",
+    "version": "2.0.0",
+    "services": {
+        "mongodb": "connected" if mongo_enabled else "optional (not connected)",
+        "redis": "connected" if redis_enabled else "optional (not connected)",
+        "groq_ai": "ready",
+        "agentic_orchestrator": "active",
+        "token_manager": "active",
+        "merchant_communicator": "active",
+        "verification_agent": "active"
+    },
+    "risk_levels": {
+        "LOW": "0-29 (Approve)",
+        "MEDIUM": "30-69 (Freeze & Verify)",
+        "HIGH": "70-100 (Revoke)"
+    },
+    "workflow_capabilities": [
+        "Risk Assessment",
+        "Token Freezing/Unfreezing/Revoking",
+        "Merchant 2FA Communication",
+        "Automated Verification",
+        "Decision Making",
+        "Learning & Analytics"
+    ]
+})
+
 @app.get("/health")
-def health_check():
+async def health_check():
     """Health check endpoint"""
-    return {
-        "status": "healthy",
-        "service": "TokenTrust Agentic AI Risk Service",
-        "version": "2.0.0",
-        "services": {
-            "mongodb": "connected" if mongo_enabled else "optional (not connected)",
-            "redis": "connected" if redis_enabled else "optional (not connected)",
-            "groq_ai": "ready",
-            "agentic_orchestrator": "active",
-            "token_manager": "active",
-            "merchant_communicator": "active",
-            "verification_agent": "active"
-        },
-        "risk_levels": {
-            "LOW": "0-29 (Approve)",
-            "MEDIUM": "30-69 (Freeze & Verify)",
-            "HIGH": "70-100 (Revoke)"
-        },
-        "workflow_capabilities": [
-            "Risk Assessment",
-            "Token Freezing/Unfreezing/Revoking",
-            "Merchant 2FA Communication",
-            "Automated Verification",
-            "Decision Making",
-            "Learning & Analytics"
-        ]
-    }
+    return Response(content=_HEALTH_BYTES, media_type="application/json")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,157 @@
+"""
+Shared outbound clients for the risk service.
+
+One pooled HTTP transport is built per worker process and every ChatGroq
+instance is created on top of it, so agents reuse keep-alive connections to
+Groq instead of each paying for its own TCP/TLS setup.
+"""
+
+import os
+import time
+import threading
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+from dotenv import load_dotenv
+from langchain_groq import ChatGroq
+
+load_dotenv()
+
+GROQ_MODEL_NAME = "llama-3.3-70b-versatile"
+
+# Connection pool sizing (shared by every agent in this process)
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+# Bounded retries per Groq call; the circuit breaker below handles outages
+LLM_MAX_RETRIES = 1
+
+# Circuit breaker: consecutive Groq failures before opening, and cool-down
+LLM_BREAKER_FAIL_MAX = 5
+LLM_BREAKER_RESET_TIMEOUT_SECONDS = 30
+
+# MongoDB connection pool per worker (request-path client)
+MONGO_APP_NAME = "risk-service"
+MONGO_MAX_POOL_SIZE = 200
+MONGO_MIN_POOL_SIZE = 20
+MONGO_WAIT_QUEUE_TIMEOUT_MS = 500
+
+# Redis connection pool per async client, with keep-alive and idle health checks
+REDIS_MAX_CONNECTIONS = 200
+REDIS_HEALTH_CHECK_INTERVAL_SECONDS = 30
+
+http_client = httpx.Client(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+http_async_client = httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+
+
+@lru_cache(maxsize=None)
+def get_llm(temperature: float) -> ChatGroq:
+    """Return the process-wide ChatGroq client for the given temperature."""
+    return ChatGroq(
+        temperature=temperature,
+        model_name=GROQ_MODEL_NAME,
+        api_key=os.getenv("GROQ_API_KEY"),
+        max_retries=LLM_MAX_RETRIES,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling Groq while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Minimal consecutive-failure circuit breaker.
+
+    After ``fail_max`` consecutive failures, calls fail fast with
+    CircuitOpenError for ``reset_timeout`` seconds. Once the cool-down has
+    passed the circuit is half-open: exactly one call is let through as a
+    trial while every other call keeps failing fast until it finishes.
+    Success closes the circuit again; failure re-opens it for another
+    cool-down. Callers already catch exceptions and fall back to rule-based
+    results, so an open circuit simply routes every request to that
+    fallback immediately.
+    """
+
+    def __init__(self, fail_max: int, reset_timeout: float):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def _before_call(self) -> bool:
+        """Admit or reject a call; returns True when the call is the half-open trial."""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if self._trial_in_flight or time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError("Groq circuit breaker is open")
+            self._trial_in_flight = True
+            return True
+
+    def _on_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def _on_failure(self, trial: bool):
+        with self._lock:
+            if trial:
+                self._trial_in_flight = False
+                self._opened_at = time.monotonic()
+                return
+            self._failures += 1
+            if self._failures >= self.fail_max:
+                self._opened_at = time.monotonic()
+
+    def _on_abort(self, trial: bool):
+        # Cancelled or interrupted: no verdict on Groq, so the next caller runs the trial
+        if trial:
+            with self._lock:
+                self._trial_in_flight = False
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        trial = self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self._on_failure(trial)
+            raise
+        except BaseException:
+            self._on_abort(trial)
+            raise
+        self._on_success()
+        return result
+
+    async def call_async(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        trial = self._before_call()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception:
+            self._on_failure(trial)
+            raise
+        except BaseException:
+            self._on_abort(trial)
+            raise
+        self._on_success()
+        return result
+
+
+# Shared by every agent: all of them talk to the same Groq endpoint
+llm_breaker = CircuitBreaker(LLM_BREAKER_FAIL_MAX, LLM_BREAKER_RESET_TIMEOUT_SECONDS)
+
+
+async def close_clients() -> None:
+    """Close the shared HTTP connection pools."""
+    http_client.close()
+    await http_async_client.aclose()
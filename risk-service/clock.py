@@ -0,0 +1,28 @@
+"""
+Coarse wall-clock timestamps for API responses.
+
+Response timestamps only need about one-second precision, so the ISO string
+is formatted at most once per second and shared by every request in between.
+Refreshing lazily on read (rather than from a background ticker) means the
+value can never go stale when no event loop task is running, e.g. under
+TestClient without the lifespan context.
+"""
+
+import time
+from datetime import datetime
+
+# How long a formatted timestamp is reused
+CLOCK_RESOLUTION_SECONDS = 1.0
+
+_now_iso = datetime.utcnow().isoformat()
+_next_refresh = time.monotonic() + CLOCK_RESOLUTION_SECONDS
+
+
+def now_iso() -> str:
+    """Current UTC time as an ISO-8601 string, refreshed at most once per second."""
+    global _now_iso, _next_refresh
+    now = time.monotonic()
+    if now >= _next_refresh:
+        _now_iso = datetime.utcnow().isoformat()
+        _next_refresh = now + CLOCK_RESOLUTION_SECONDS
+    return _now_iso
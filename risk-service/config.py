@@ -3,6 +3,8 @@ TokenTrust Configuration
 Canonical thresholds and configuration constants
 """
 
+import os
+
 # Risk Score Thresholds (0-100)
 APPROVE_MAX = 49
 MEDIUM_MIN = 50
@@ -34,4 +36,29 @@ AUDIT_ACTION_UNFREEZE = "unfreeze_token"
 AUDIT_ACTION_REVOKE = "revoke_token"
 AUDIT_ACTION_ANALYZE = "analyze_event"
 AUDIT_ACTION_VERIFY = "verify_event"
-AUDIT_ACTION_TRIAGE = "triage_event"
\ No newline at end of file
+AUDIT_ACTION_TRIAGE = "triage_event"
+
+# Batch API
+BATCH_MAX_REQUESTS = 50
+
+# Audit log batching: entries are buffered and appended to the log once
+# AUDIT_BATCH_SIZE are pending or AUDIT_FLUSH_INTERVAL_MS after the first one
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "100"))
+AUDIT_FLUSH_INTERVAL_MS = int(os.getenv("AUDIT_FLUSH_INTERVAL_MS", "50"))
+# Most recent entries kept per target in the audit query index
+AUDIT_INDEX_MAX_PER_TARGET = 10_000
+# In-memory audit log cap; older entries are evicted, and appended as JSON
+# lines to AUDIT_SPILL_PATH when it is set (dropped otherwise)
+AUDIT_LOG_MAX_ENTRIES = int(os.getenv("AUDIT_LOG_MAX_ENTRIES", "50000"))
+AUDIT_SPILL_PATH = os.getenv("AUDIT_SPILL_PATH")
+
+# Read caches for the polled GET /event and /token status endpoints; any
+# storage write to an event or token evicts its entry
+STATUS_CACHE_MAXSIZE = 10_000
+STATUS_CACHE_TTL_SECONDS = 1.0
+
+# Event / audit IDs are random UUIDs drawn from one os.urandom call per this many
+UUID_POOL_SIZE = 1024
+
+# Test fixture endpoints (/v2/test/fixture/*) are only served when this is set
+TEST_FIXTURES_ENABLED = os.getenv("TOKENTRUST_TEST_FIXTURES", "").lower() in ("1", "true", "yes")
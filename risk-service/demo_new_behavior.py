@@ -3,11 +3,10 @@ Demo: New TokenTrust Behavior
 Shows how final_status and token_status are only returned when decisions are complete
 """
 
-import asyncio
 import json
 from datetime import datetime
 
-async def demo_new_behavior():
+def demo_new_behavior():
     """Demonstrate the new conditional status behavior"""
     
     print("🚀 TokenTrust New Behavior Demo")
@@ -93,4 +92,4 @@ async def demo_new_behavior():
     print("   • Proper separation of concerns")
 
 if __name__ == "__main__":
-    asyncio.run(demo_new_behavior())
\ No newline at end of file
+    demo_new_behavior()
\ No newline at end of file
@@ -4,13 +4,85 @@ Demonstrates the complete robust workflow with proper error handling
 """
 
 import requests
-import json
+import orjson
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+import argparse
+import io
+import queue
+import sys
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, Any
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
 # Configuration
 BASE_URL = "http://localhost:8000/v2"
+
+# Keep-alive connection pool shared by every demo request; sized well above
+# SCENARIO_MAX_WORKERS * 4 so concurrent scenarios never wait for a connection.
+# HTTP/1.1 on purpose: the service runs under uvicorn, which does not speak
+# HTTP/2, so a multiplexing client would fall back to HTTP/1.1 anyway.
+HTTP_POOL_CONNECTIONS = 20
+HTTP_POOL_MAXSIZE = 50
+HTTP_RETRY = Retry(total=3, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+SESSION_HEADERS = {
+    "User-Agent": "TokenTrustDemo/1.0",
+    "Connection": "keep-alive",
+    "Content-Type": "application/json"
+}
+
+# Follow-up calls from concurrent scenarios are coalesced into /batch POSTs:
+# a batch is sent once it holds BATCH_MAX_SIZE calls or BATCH_MAX_WAIT_SECONDS
+# after its first call, whichever comes first
+BATCH_MAX_SIZE = 10
+BATCH_MAX_WAIT_SECONDS = 0.05
+
+# Workflow steps are data: each step is one API call plus what to print and
+# check. "$name" values in a body are filled in from the scenario (plus the
+# event_id of the latest analysis and the run timestamp); "{name}" fields in
+# an endpoint are formatted the same way.
+ANALYZE_BODY = {
+    "token_id": "$token_id",
+    "merchant_id": "$merchant_id",
+    "amount": "$amount",
+    "risk_score": "$risk_score",
+    "metadata": {"demo": True, "scenario": "$name"}
+}
+
+def analyze_step(announce: str, metadata: Optional[Dict[str, Any]] = None, **step: Any) -> Dict[str, Any]:
+    """POST /analyze step for the scenario's transaction, with optional extra metadata"""
+    body = {**ANALYZE_BODY, "metadata": {**ANALYZE_BODY["metadata"], **(metadata or {})}}
+    return {
+        "announce": announce,
+        "verb": "POST",
+        "endpoint": "/analyze",
+        "body": body,
+        "result_title": "Analysis Result",
+        "fail": "❌ Transaction analysis failed",
+        **step
+    }
+
+def merchant_response_step(announce: str, verification_method: str, evidence: Dict[str, Any], **step: Any) -> Dict[str, Any]:
+    """POST /merchant-response step answering the latest analysis with the scenario's merchant_response"""
+    return {
+        "announce": announce,
+        "verb": "POST",
+        "endpoint": "/merchant-response",
+        "body": {
+            "event_id": "$event_id",
+            "user_response": "$merchant_response",
+            "verification_method": verification_method,
+            "evidence": evidence
+        },
+        "show_request": "Merchant Verification Data",
+        "result_title": "Verification Result",
+        "fail": "❌ Merchant verification processing failed",
+        "unexpected": "❌ Unexpected verification result",
+        **step
+    }
+
 DEMO_SCENARIOS = [
     {
         "name": "Low Risk Transaction",
@@ -18,7 +90,23 @@ DEMO_SCENARIOS = [
         "merchant_id": "coffee_shop_abc",
         "amount": 4.50,
         "risk_score": 25,
-        "expected_outcome": "approved_immediately"
+        "expected_outcome": "approved_immediately",
+        "steps": [
+            analyze_step(
+                "📤 Sending transaction for analysis...",
+                show_request="Request Data",
+                expect={"risk_level": "LOW", "decision": "approve"},
+                unexpected="❌ Unexpected result for low risk",
+                ok="✅ Low risk transaction approved immediately as expected"
+            ),
+            {
+                "verb": "GET",
+                "endpoint": "/token/{token_id}/status",
+                "expect": {"status": "active"},
+                "unexpected": "⚠️  Unexpected token status detected",
+                "ok": "✅ Token remains active - workflow complete"
+            }
+        ]
     },
     {
         "name": "Medium Risk Transaction - Success",
@@ -27,7 +115,22 @@ DEMO_SCENARIOS = [
         "amount": 299.99,
         "risk_score": 65,
         "expected_outcome": "frozen_then_approved",
-        "merchant_response": "Yes, I authorized this purchase of a tablet"
+        "merchant_response": "Yes, I authorized this purchase of a tablet",
+        "steps": [
+            analyze_step(
+                "📤 Step 1: Sending medium-risk transaction for analysis...",
+                expect={"risk_level": "MEDIUM", "token_status": "frozen"},
+                unexpected="❌ Expected MEDIUM risk and frozen token, got",
+                ok="✅ Transaction correctly flagged as medium risk, token frozen"
+            ),
+            merchant_response_step(
+                "\n📞 Step 2: Simulating merchant 2FA verification...",
+                verification_method="sms_2fa",
+                evidence={"verification_time": "$run_ts", "device_used": "mobile_app", "location_verified": True},
+                expect={"verification_successful": True, "token_status": "active"},
+                ok="✅ Merchant verification successful, token unfrozen"
+            )
+        ]
     },
     {
         "name": "High Risk Transaction - Failed Verification",
@@ -36,7 +139,23 @@ DEMO_SCENARIOS = [
         "amount": 2500.00,
         "risk_score": 88,
         "expected_outcome": "frozen_then_revoked",
-        "merchant_response": "No, I did not make this purchase. This is fraud!"
+        "merchant_response": "No, I did not make this purchase. This is fraud!",
+        "steps": [
+            analyze_step(
+                "📤 Step 1: Sending high-risk transaction for analysis...",
+                metadata={"high_value": True},
+                expect={"risk_level": "HIGH", "token_status": "frozen", "auto_revoke_candidate": True},
+                unexpected="❌ Expected HIGH risk, frozen token, and auto-revoke candidate",
+                ok="✅ High-risk transaction detected, token frozen as revoke candidate"
+            ),
+            merchant_response_step(
+                "\n📞 Step 2: Simulating failed merchant verification...",
+                verification_method="phone_call",
+                evidence={"user_confirmed_fraud": True, "verification_time": "$run_ts", "security_alert": True},
+                expect={"verification_successful": False, "token_status": "revoked"},
+                ok="✅ Fraud confirmed, token revoked for security"
+            )
+        ]
     },
     {
         "name": "Agent Triage Override", 
@@ -46,7 +165,27 @@ DEMO_SCENARIOS = [
         "risk_score": 72,
         "expected_outcome": "agent_overridden",
         "agent_decision": "approve",
-        "agent_reasoning": "AI detected regular customer pattern - false positive risk score"
+        "agent_reasoning": "AI detected regular customer pattern - false positive risk score",
+        "steps": [
+            analyze_step(
+                "📤 Step 1: Sending transaction for initial analysis...",
+                metadata={"frequent_customer": True},
+                result_title="Initial Analysis Result",
+                ok="✅ Transaction flagged for verification due to risk score"
+            ),
+            {
+                "announce": "\n🤖 Step 2: AI Agent performing advanced analysis and triage...",
+                "verb": "POST",
+                "endpoint": "/triage",
+                "body": {"event_id": "$event_id", "agent_decision": "$agent_decision", "reasoning": "$agent_reasoning"},
+                "show_request": "Agent Triage Decision",
+                "result_title": "Triage Result",
+                "expect": {"action_taken": "approved_unfrozen"},
+                "fail": "❌ Agent triage processing failed",
+                "unexpected": "❌ Unexpected triage result",
+                "ok": "✅ AI Agent override successful - transaction approved despite risk score"
+            }
+        ]
     },
     {
         "name": "Revoked Token Attempt",
@@ -55,406 +194,436 @@ DEMO_SCENARIOS = [
         "amount": 45.00,
         "risk_score": 30,
         "expected_outcome": "rejected_revoked_token",
-        "pre_revoke": True
+        "steps": [
+            # Pre-revoke the token (simulate previous security incident) in one call
+            # to the test fixture endpoint when the server has fixtures enabled
+            {
+                "announce": "🔒 Step 1: Pre-revoking token (simulating previous security incident)...",
+                "verb": "POST",
+                "endpoint": "/test/fixture/revoked-token",
+                "body": {"token_id": "$token_id"},
+                "expect": {"token_status": "revoked"},
+                "fail": "❌ Failed to revoke token in setup",
+                "ok": "✅ Token successfully revoked from previous security incident",
+                # Fixtures disabled: get the token into the system with a high-risk
+                # transaction, then fail its verification
+                "fallback": [
+                    {
+                        "verb": "POST",
+                        "endpoint": "/analyze",
+                        "body": {
+                            "token_id": "$token_id",
+                            "merchant_id": "previous_merchant",
+                            "amount": 1000.00,
+                            "risk_score": 95,
+                            "metadata": {"setup": True}
+                        },
+                        "fail": "❌ Failed to revoke token in setup"
+                    },
+                    {
+                        "verb": "POST",
+                        "endpoint": "/merchant-response",
+                        "body": {
+                            "event_id": "$event_id",
+                            "user_response": "This is fraud, I never made this transaction",
+                            "verification_method": "security_call"
+                        },
+                        "fail": "❌ Failed to revoke token in setup",
+                        "ok": "✅ Token successfully revoked from previous security incident"
+                    }
+                ]
+            },
+            analyze_step(
+                "\n📤 Step 2: Attempting new transaction on revoked token...",
+                show_request="Transaction Request",
+                expect_status=403,
+                result_title="Expected Error Response",
+                fail="❌ Expected 403 Forbidden, got: {status}",
+                ok="✅ Revoked token correctly rejected with 403 Forbidden"
+            )
+        ]
     }
 ]
 
+# Scenarios are independent (distinct token_ids) and run concurrently
+SCENARIO_MAX_WORKERS = min(8, len(DEMO_SCENARIOS))
+
+def render(template: Any, context: Dict[str, Any]) -> Any:
+    """Fill "$name" placeholders in a step body template from the scenario context"""
+    if isinstance(template, str) and template.startswith("$"):
+        return context[template[1:]]
+    if isinstance(template, dict):
+        return {key: render(value, context) for key, value in template.items()}
+    return template
+
+def render_request(step: Dict[str, Any], context: Dict[str, Any]) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    """(method, endpoint, data) of a workflow step for the given scenario context"""
+    return step["verb"], step["endpoint"].format(**context), render(step.get("body"), context)
+
+class RequestBatcher:
+    """
+    Coalesces sub-requests submitted from several threads into batch calls.
+
+    ``send_batch`` receives a list of {"method", "path", "body"} descriptors and
+    returns the ordered (status_code, body) results, or None if the batch call
+    itself failed (each caller then gets None and falls back to a direct call).
+    """
+
+    def __init__(self, send_batch: Callable[[List[Dict[str, Any]]], Optional[List[Tuple[int, Any]]]],
+                 max_size: int = BATCH_MAX_SIZE, max_wait: float = BATCH_MAX_WAIT_SECONDS):
+        self._send_batch = send_batch
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[Optional[Tuple[Dict[str, Any], Future]]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="request-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, method: str, endpoint: str, data: Dict[Any, Any] = None) -> Future:
+        """Queue a sub-request; the future resolves to (status_code, body) or None"""
+        future: Future = Future()
+        self._queue.put(({"method": method, "path": endpoint, "body": data}, future))
+        return future
+
+    def close(self):
+        """Flush anything still queued and stop the worker thread"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            pending = [item]
+            deadline = time.monotonic() + self.max_wait
+            closing = False
+            while len(pending) < self.max_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                pending.append(item)
+            self._flush(pending)
+            if closing:
+                return
+
+    def _flush(self, pending: List[Tuple[Dict[str, Any], Future]]):
+        try:
+            results = self._send_batch([request for request, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        if results is None:
+            results = [None] * len(pending)
+        for (_, future), result in zip(pending, results):
+            future.set_result(result)
+
 class RobustAPIDemo:
-    def __init__(self, base_url: str = BASE_URL):
+    def __init__(self, base_url: str = BASE_URL, verbose: bool = True):
         self.base_url = base_url
+        # False skips request/response JSON dumps (benchmark and CI runs)
+        self.verbose = verbose
         self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_CONNECTIONS,
+            pool_maxsize=HTTP_POOL_MAXSIZE,
+            max_retries=HTTP_RETRY
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(SESSION_HEADERS)
+        # Per-thread output buffer so concurrent scenarios print as whole blocks
+        self._output = threading.local()
+        self._print_lock = threading.Lock()
+        # Evidence timestamp shared by every payload of a run (refreshed in run_full_demo)
+        self._run_ts = datetime.utcnow().isoformat()
+        # Coalesces follow-up calls while run_full_demo is running
+        self._batcher: Optional[RequestBatcher] = None
+
+    def _print(self, *args, **kwargs):
+        """print(), buffered per scenario while scenarios run concurrently"""
+        buffer = getattr(self._output, "buffer", None)
+        if buffer is not None:
+            print(*args, file=buffer, **kwargs)
+            return
+        with self._print_lock:
+            print(*args, **kwargs)
         
     def print_section(self, title: str):
-        print(f"\n{'='*60}")
-        print(f"  {title}")
-        print(f"{'='*60}")
+        self._print(f"\n{'='*60}")
+        self._print(f"  {title}")
+        self._print(f"{'='*60}")
         
     def print_subsection(self, title: str):
-        print(f"\n{'-'*40}")
-        print(f"  {title}")
-        print(f"{'-'*40}")
+        self._print(f"\n{'-'*40}")
+        self._print(f"  {title}")
+        self._print(f"{'-'*40}")
         
     def pretty_print_json(self, data: Dict[Any, Any], title: str = ""):
+        if not self.verbose:
+            return
         if title:
-            print(f"\n📋 {title}:")
-        print(json.dumps(data, indent=2, default=str))
-        
-    def make_request(self, method: str, endpoint: str, data: Dict[Any, Any] = None) -> requests.Response:
-        """Make API request and handle errors"""
+            self._print(f"\n📋 {title}:")
+        self._print(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NAIVE_UTC).decode())
+
+    @staticmethod
+    def _json(response: requests.Response) -> Any:
+        """Decode a response body with orjson instead of response.json()"""
+        return orjson.loads(response.content)
+        
+    def make_request(self, method: str, endpoint: str, data: Dict[Any, Any] = None,
+                     body_bytes: Optional[bytes] = None) -> requests.Response:
+        """
+        Make API request and handle errors.
+        POST bodies are serialized once with orjson (or passed in pre-serialized as
+        body_bytes) and sent as raw bytes, so adapter retries resend them as-is.
+        """
         url = f"{self.base_url}{endpoint}"
         
         try:
             if method.upper() == "GET":
                 response = self.session.get(url)
             elif method.upper() == "POST":
-                response = self.session.post(url, json=data)
+                if body_bytes is None:
+                    body_bytes = orjson.dumps(data)
+                # Content-Type: application/json is already a session header
+                response = self.session.post(url, data=body_bytes)
             else:
                 raise ValueError(f"Unsupported method: {method}")
                 
-            print(f"🌐 {method.upper()} {endpoint} -> Status: {response.status_code}")
+            self._print(f"🌐 {method.upper()} {endpoint} -> Status: {response.status_code}")
             
             if response.status_code >= 400:
-                print(f"❌ Error Response: {response.text}")
+                self._print(f"❌ Error Response: {response.text}")
             
             return response
             
         except requests.exceptions.RequestException as e:
-            print(f"❌ Request failed: {e}")
+            self._print(f"❌ Request failed: {e}")
             return None
     
+    def send_batch(self, requests_data: List[Dict[str, Any]]) -> Optional[List[Tuple[int, Any]]]:
+        """POST sub-requests to /batch; ordered (status_code, body) results, or None on failure"""
+        response = self.make_request("POST", "/batch", {"requests": requests_data})
+        if not response or response.status_code != 200:
+            self._print("⚠️  Batch request failed - falling back to individual requests")
+            return None
+        return [(item["status"], item["body"]) for item in self._json(response)["responses"]]
+
+    def prefetch_first_steps(self, scenarios: List[Dict[str, Any]]) -> List[Optional[Tuple[int, Any]]]:
+        """Send every scenario's opening request in a single /batch round-trip"""
+        results = self.send_batch([
+            {"method": method, "path": endpoint, "body": data}
+            for method, endpoint, data in map(self.first_request, scenarios)
+        ])
+        return results if results is not None else [None] * len(scenarios)
+
+    def request_batched(self, method: str, endpoint: str, data: Dict[Any, Any] = None) -> Tuple[Optional[int], Any]:
+        """(status_code, body) of a request sent through the batcher, or directly if it is not running"""
+        if self._batcher is not None:
+            result = self._batcher.submit(method, endpoint, data).result()
+            if result is not None:
+                return result
+        return self.request_json(method, endpoint, data)
+
+    def request_json(self, method: str, endpoint: str, data: Dict[Any, Any] = None) -> Tuple[Optional[int], Any]:
+        """Make API request and return (status_code, decoded body)"""
+        response = self.make_request(method, endpoint, data)
+        if response is None:
+            return None, None
+        try:
+            return response.status_code, self._json(response)
+        except orjson.JSONDecodeError:
+            return response.status_code, None
+
+    def scenario_context(self, scenario: Dict[str, Any]) -> Dict[str, Any]:
+        """Values available to a scenario's step templates"""
+        return {**scenario, "run_ts": self._run_ts}
+
+    def first_request(self, scenario: Dict[str, Any]) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+        """
+        Opening (method, endpoint, data) call of a scenario's workflow.
+        Opening calls are independent across scenarios, so they can share one /batch round-trip.
+        """
+        return render_request(scenario["steps"][0], self.scenario_context(scenario))
+
+    def first_step(self, scenario: Dict[str, Any], prefetched: Optional[Tuple[int, Any]]) -> Tuple[Optional[int], Any]:
+        """(status_code, body) of a scenario's opening request, from the batch or a direct call"""
+        if prefetched is not None:
+            return prefetched
+        return self.request_json(*self.first_request(scenario))
+
     def check_health(self):
         """Check API health"""
         self.print_section("Health Check")
         
         response = self.make_request("GET", "/health")
         if response and response.status_code == 200:
-            self.pretty_print_json(response.json(), "System Status")
-            print("✅ API is healthy and ready")
+            self.pretty_print_json(self._json(response), "System Status")
+            self._print("✅ API is healthy and ready")
         else:
-            print("❌ API health check failed")
+            self._print("❌ API health check failed")
             return False
         return True
         
-    def demo_low_risk_workflow(self, scenario: Dict[str, Any]):
-        """Demonstrate low-risk transaction workflow"""
+    def run_steps(self, scenario: Dict[str, Any], prefetched: Optional[Tuple[int, Any]] = None):
+        """
+        Execute a scenario's workflow steps in order.
+        Each step sends its request, prints it and the result as configured, and checks the
+        status code and expected fields; the workflow stops at the first step that fails.
+        A step answered with 404 is replaced by its "fallback" steps, if it has any.
+        """
         self.print_subsection(f"Scenario: {scenario['name']}")
         
-        # Analyze transaction
-        request_data = {
-            "token_id": scenario["token_id"],
-            "merchant_id": scenario["merchant_id"],
-            "amount": scenario["amount"],
-            "risk_score": scenario["risk_score"],
-            "metadata": {"demo": True, "scenario": scenario["name"]}
-        }
-        
-        print("📤 Sending transaction for analysis...")
-        self.pretty_print_json(request_data, "Request Data")
-        
-        response = self.make_request("POST", "/analyze", request_data)
-        
-        if response and response.status_code == 200:
-            result = response.json()
-            self.pretty_print_json(result, "Analysis Result")
+        context = self.scenario_context(scenario)
+        steps = list(scenario["steps"])
+        index = 0
+        while index < len(steps):
+            step = steps[index]
+            if step.get("announce"):
+                self._print(step["announce"])
+            method, endpoint, data = render_request(step, context)
+            if step.get("show_request"):
+                self.pretty_print_json(data, step["show_request"])
             
-            # Verify expectations
-            if result["risk_level"] == "LOW" and result["decision"] == "approve":
-                print("✅ Low risk transaction approved immediately as expected")
-                
-                # Check token status
-                token_response = self.make_request("GET", f"/token/{scenario['token_id']}/status")
-                if token_response and token_response.status_code == 200:
-                    token_status = token_response.json()
-                    
-                    if token_status["status"] == "active":
-                        print("✅ Token remains active - workflow complete")
-                    else:
-                        print("⚠️  Unexpected token status detected")
+            if index == 0:
+                status_code, result = self.first_step(scenario, prefetched)
+            elif method == "POST":
+                status_code, result = self.request_batched(method, endpoint, data)
             else:
-                print(f"❌ Unexpected result for low risk: {result}")
-        else:
-            print("❌ Transaction analysis failed")
-    
-    def demo_medium_risk_workflow(self, scenario: Dict[str, Any]):
-        """Demonstrate medium-risk transaction with merchant verification"""
-        self.print_subsection(f"Scenario: {scenario['name']}")
-        
-        # Step 1: Analyze transaction
-        request_data = {
-            "token_id": scenario["token_id"],
-            "merchant_id": scenario["merchant_id"],
-            "amount": scenario["amount"],
-            "risk_score": scenario["risk_score"],
-            "metadata": {"demo": True, "scenario": scenario["name"]}
-        }
-        
-        print("📤 Step 1: Sending medium-risk transaction for analysis...")
-        response = self.make_request("POST", "/analyze", request_data)
-        
-        if not response or response.status_code != 200:
-            print("❌ Transaction analysis failed")
-            return
-            
-        analysis_result = response.json()
-        self.pretty_print_json(analysis_result, "Analysis Result")
-        
-        if analysis_result["risk_level"] != "MEDIUM" or analysis_result["token_status"] != "frozen":
-            print(f"❌ Expected MEDIUM risk and frozen token, got: {analysis_result}")
-            return
+                status_code, result = self.request_json(method, endpoint, data)
             
-        print("✅ Transaction correctly flagged as medium risk, token frozen")
-        
-        # Step 2: Simulate merchant verification
-        print("\n📞 Step 2: Simulating merchant 2FA verification...")
-        time.sleep(1)  # Simulate verification delay
-        
-        merchant_data = {
-            "event_id": analysis_result["event_id"],
-            "user_response": scenario["merchant_response"],
-            "verification_method": "sms_2fa",
-            "evidence": {
-                "verification_time": datetime.utcnow().isoformat(),
-                "device_used": "mobile_app",
-                "location_verified": True
-            }
-        }
-        
-        self.pretty_print_json(merchant_data, "Merchant Verification Data")
-        merchant_response = self.make_request("POST", "/merchant-response", merchant_data)
-        
-        if merchant_response and merchant_response.status_code == 200:
-            merchant_result = merchant_response.json()
-            self.pretty_print_json(merchant_result, "Verification Result")
-            
-            if merchant_result["verification_successful"] and merchant_result["token_status"] == "active":
-                print("✅ Merchant verification successful, token unfrozen")
-            else:
-                print(f"❌ Unexpected verification result: {merchant_result}")
-        else:
-            print("❌ Merchant verification processing failed")
-    
-    def demo_high_risk_workflow(self, scenario: Dict[str, Any]):
-        """Demonstrate high-risk transaction with failed verification"""
-        self.print_subsection(f"Scenario: {scenario['name']}")
-        
-        # Step 1: Analyze high-risk transaction
-        request_data = {
-            "token_id": scenario["token_id"],
-            "merchant_id": scenario["merchant_id"],
-            "amount": scenario["amount"],
-            "risk_score": scenario["risk_score"],
-            "metadata": {"demo": True, "scenario": scenario["name"], "high_value": True}
-        }
-        
-        print("📤 Step 1: Sending high-risk transaction for analysis...")
-        response = self.make_request("POST", "/analyze", request_data)
-        
-        if not response or response.status_code != 200:
-            print("❌ Transaction analysis failed")
-            return
-            
-        analysis_result = response.json()
-        self.pretty_print_json(analysis_result, "Analysis Result")
-        
-        if (analysis_result["risk_level"] != "HIGH" or 
-            analysis_result["token_status"] != "frozen" or
-            not analysis_result["auto_revoke_candidate"]):
-            print(f"❌ Expected HIGH risk, frozen token, and auto-revoke candidate: {analysis_result}")
-            return
-            
-        print("✅ High-risk transaction detected, token frozen as revoke candidate")
-        
-        # Step 2: Simulate failed merchant verification
-        print("\n📞 Step 2: Simulating failed merchant verification...")
-        time.sleep(1)
-        
-        merchant_data = {
-            "event_id": analysis_result["event_id"],
-            "user_response": scenario["merchant_response"],
-            "verification_method": "phone_call",
-            "evidence": {
-                "user_confirmed_fraud": True,
-                "verification_time": datetime.utcnow().isoformat(),
-                "security_alert": True
-            }
-        }
-        
-        self.pretty_print_json(merchant_data, "Merchant Verification Data")
-        merchant_response = self.make_request("POST", "/merchant-response", merchant_data)
-        
-        if merchant_response and merchant_response.status_code == 200:
-            merchant_result = merchant_response.json()
-            self.pretty_print_json(merchant_result, "Verification Result")
-            
-            if (not merchant_result["verification_successful"] and 
-                merchant_result["token_status"] == "revoked"):
-                print("✅ Fraud confirmed, token revoked for security")
-            else:
-                print(f"❌ Unexpected verification result: {merchant_result}")
-        else:
-            print("❌ Merchant verification processing failed")
-    
-    def demo_agent_triage_workflow(self, scenario: Dict[str, Any]):
-        """Demonstrate AI agent triage override"""
-        self.print_subsection(f"Scenario: {scenario['name']}")
-        
-        # Step 1: Analyze transaction (will be medium risk)
-        request_data = {
-            "token_id": scenario["token_id"],
-            "merchant_id": scenario["merchant_id"],
-            "amount": scenario["amount"],
-            "risk_score": scenario["risk_score"],
-            "metadata": {"demo": True, "scenario": scenario["name"], "frequent_customer": True}
-        }
-        
-        print("📤 Step 1: Sending transaction for initial analysis...")
-        response = self.make_request("POST", "/analyze", request_data)
-        
-        if not response or response.status_code != 200:
-            print("❌ Transaction analysis failed")
-            return
-            
-        analysis_result = response.json()
-        self.pretty_print_json(analysis_result, "Initial Analysis Result")
-        
-        print("✅ Transaction flagged for verification due to risk score")
-        
-        # Step 2: AI Agent triage override
-        print("\n🤖 Step 2: AI Agent performing advanced analysis and triage...")
-        time.sleep(1)
-        
-        triage_data = {
-            "event_id": analysis_result["event_id"],
-            "agent_decision": scenario["agent_decision"],
-            "reasoning": scenario["agent_reasoning"]
-        }
-        
-        self.pretty_print_json(triage_data, "Agent Triage Decision")
-        triage_response = self.make_request("POST", "/triage", triage_data)
-        
-        if triage_response and triage_response.status_code == 200:
-            triage_result = triage_response.json()
-            self.pretty_print_json(triage_result, "Triage Result")
-            
-            if triage_result["action_taken"] == "approved_unfrozen":
-                print("✅ AI Agent override successful - transaction approved despite risk score")
-            else:
-                print(f"❌ Unexpected triage result: {triage_result}")
-        else:
-            print("❌ Agent triage processing failed")
-    
-    def demo_revoked_token_workflow(self, scenario: Dict[str, Any]):
-        """Demonstrate handling of revoked token"""
-        self.print_subsection(f"Scenario: {scenario['name']}")
-        
-        # Step 1: Pre-revoke the token (simulate previous security incident)
-        if scenario.get("pre_revoke"):
-            print("🔒 Step 1: Pre-revoking token (simulating previous security incident)...")
-            
-            # First create a high-risk transaction to get it in system, then revoke
-            setup_data = {
-                "token_id": scenario["token_id"],
-                "merchant_id": "previous_merchant",
-                "amount": 1000.00,
-                "risk_score": 95,
-                "metadata": {"setup": True}
-            }
-            
-            setup_response = self.make_request("POST", "/analyze", setup_data)
-            if setup_response and setup_response.status_code == 200:
-                setup_result = setup_response.json()
-                
-                # Simulate failed verification to revoke token
-                revoke_data = {
-                    "event_id": setup_result["event_id"],
-                    "user_response": "This is fraud, I never made this transaction",
-                    "verification_method": "security_call"
-                }
-                
-                revoke_response = self.make_request("POST", "/merchant-response", revoke_data)
-                if revoke_response and revoke_response.status_code == 200:
-                    print("✅ Token successfully revoked from previous security incident")
-                else:
-                    print("❌ Failed to revoke token in setup")
-                    return
-        
-        # Step 2: Attempt new transaction on revoked token
-        print("\n📤 Step 2: Attempting new transaction on revoked token...")
-        
-        request_data = {
-            "token_id": scenario["token_id"],
-            "merchant_id": scenario["merchant_id"],
-            "amount": scenario["amount"],
-            "risk_score": scenario["risk_score"],
-            "metadata": {"demo": True, "scenario": scenario["name"]}
-        }
-        
-        self.pretty_print_json(request_data, "Transaction Request")
-        response = self.make_request("POST", "/analyze", request_data)
-        
-        if response and response.status_code == 403:
-            error_detail = response.json()
-            self.pretty_print_json(error_detail, "Expected Error Response")
-            print("✅ Revoked token correctly rejected with 403 Forbidden")
-        else:
-            print(f"❌ Expected 403 Forbidden, got: {response.status_code if response else 'None'}")
+            if status_code == 404 and step.get("fallback"):
+                self._print("⚠️  Endpoint unavailable - falling back to the equivalent API calls")
+                steps[index + 1:index + 1] = step["fallback"]
+                index += 1
+                continue
+            if status_code != step.get("expect_status", 200):
+                self._print(step.get("fail", "❌ Request failed").format(status=status_code))
+                return
+            if step.get("result_title"):
+                self.pretty_print_json(result, step["result_title"])
+            expect = step.get("expect", {})
+            if any(result.get(field) != value for field, value in expect.items()):
+                self._print(f"{step.get('unexpected', '❌ Unexpected result')}: {result}")
+                return
+            if step.get("ok"):
+                self._print(step["ok"])
+            if isinstance(result, dict) and "event_id" in result:
+                context["event_id"] = result["event_id"]
+            index += 1
     
+    @staticmethod
+    def _format_audit_entry(index: int, entry: Dict[str, Any]) -> str:
+        """Render one audit entry as a single block of text"""
+        lines = [
+            f"\n  {index}. {entry['action'].upper()} by {entry['actor']}",
+            f"     Time: {entry['timestamp']}",
+            f"     Reason: {entry['reason']}"
+        ]
+        if entry.get("details"):
+            details = orjson.dumps(entry["details"], option=orjson.OPT_INDENT_2).decode()
+            lines.append("     Details: " + details.replace("\n", "\n     "))
+        return "\n".join(lines)
+
     def show_audit_trail(self, token_id: str):
         """Display audit trail for a token"""
-        print(f"\n📊 Audit Trail for Token: {token_id}")
+        self._print(f"\n📊 Audit Trail for Token: {token_id}")
         
         audit_response = self.make_request("GET", f"/audit/{token_id}")
         if audit_response and audit_response.status_code == 200:
-            audit_data = audit_response.json()
+            audit_data = self._json(audit_response)
             
-            print(f"\nFound {len(audit_data['entries'])} audit entries:")
-            for i, entry in enumerate(audit_data["entries"], 1):
-                print(f"\n  {i}. {entry['action'].upper()} by {entry['actor']}")
-                print(f"     Time: {entry['timestamp']}")
-                print(f"     Reason: {entry['reason']}")
-                if entry.get("details"):
-                    print(f"     Details: {json.dumps(entry['details'], indent=8)}")
+            entries = audit_data["entries"]
+            # Whole trail rendered into one string and written with a single call
+            self._print("\n".join([
+                f"\nFound {len(entries)} audit entries:",
+                *(self._format_audit_entry(i, entry) for i, entry in enumerate(entries, 1))
+            ]))
         else:
-            print("❌ Failed to retrieve audit trail")
+            self._print("❌ Failed to retrieve audit trail")
+    
+    def run_scenario(self, scenario: Dict[str, Any], prefetched: Optional[Tuple[int, Any]] = None):
+        """Run one scenario and its audit trail, then emit its output in one piece"""
+        self._output.buffer = io.StringIO()
+        try:
+            self.run_steps(scenario, prefetched)
+            
+            # Show audit trail for this token
+            self.show_audit_trail(scenario["token_id"])
+            
+        except Exception as e:
+            self._print(f"❌ Error in scenario '{scenario['name']}': {e}")
+        finally:
+            output = self._output.buffer.getvalue()
+            self._output.buffer = None
+            with self._print_lock:
+                sys.stdout.write(output)
+                sys.stdout.flush()
     
     def run_full_demo(self):
         """Run complete demo of all scenarios"""
         self.print_section("TokenTrust Robust API Demo")
-        print("Demonstrating production-ready workflow with proper error handling")
-        
-        # Health check first
-        if not self.check_health():
-            print("❌ Cannot proceed - API is not healthy")
-            return
+        self._print("Demonstrating production-ready workflow with proper error handling")
+        self._run_ts = datetime.utcnow().isoformat()
         
-        # Run each scenario
-        for scenario in DEMO_SCENARIOS:
-            try:
-                if scenario["expected_outcome"] == "approved_immediately":
-                    self.demo_low_risk_workflow(scenario)
-                    
-                elif scenario["expected_outcome"] == "frozen_then_approved":
-                    self.demo_medium_risk_workflow(scenario)
-                    
-                elif scenario["expected_outcome"] == "frozen_then_revoked":
-                    self.demo_high_risk_workflow(scenario)
-                    
-                elif scenario["expected_outcome"] == "agent_overridden":
-                    self.demo_agent_triage_workflow(scenario)
-                    
-                elif scenario["expected_outcome"] == "rejected_revoked_token":
-                    self.demo_revoked_token_workflow(scenario)
-                
-                # Show audit trail for this token
-                self.show_audit_trail(scenario["token_id"])
-                
-                print("\n⏱️  Pausing before next scenario...")
-                time.sleep(2)
-                
-            except Exception as e:
-                print(f"❌ Error in scenario '{scenario['name']}': {e}")
-                continue
-        
-        # Final system status
-        self.print_section("Demo Complete - Final System Status")
-        self.check_health()
-        
-        print(f"\n🎉 Demo completed successfully!")
-        print("Key features demonstrated:")
-        print("  ✅ Risk-based transaction classification")
-        print("  ✅ Idempotent token lifecycle management") 
-        print("  ✅ Proper HTTP status codes and error handling")
-        print("  ✅ Comprehensive audit logging")
-        print("  ✅ AI agent triage capabilities")
-        print("  ✅ End-to-end workflow robustness")
+        try:
+            # Health check first
+            if not self.check_health():
+                self._print("❌ Cannot proceed - API is not healthy")
+                return
+        
+            # Opening requests of every scenario go out together in one batch
+            first_steps = self.prefetch_first_steps(DEMO_SCENARIOS)
+        
+            # Run scenarios concurrently; each prints its output as one block when done
+            self._batcher = RequestBatcher(self.send_batch)
+            with ThreadPoolExecutor(max_workers=SCENARIO_MAX_WORKERS) as executor:
+                futures = [
+                    executor.submit(self.run_scenario, scenario, prefetched)
+                    for scenario, prefetched in zip(DEMO_SCENARIOS, first_steps)
+                ]
+                for future in as_completed(futures):
+                    future.result()
+        
+            # Final system status
+            self.print_section("Demo Complete - Final System Status")
+            self.check_health()
+        
+            self._print(f"\n🎉 Demo completed successfully!")
+            self._print("Key features demonstrated:")
+            self._print("  ✅ Risk-based transaction classification")
+            self._print("  ✅ Idempotent token lifecycle management") 
+            self._print("  ✅ Proper HTTP status codes and error handling")
+            self._print("  ✅ Comprehensive audit logging")
+            self._print("  ✅ AI agent triage capabilities")
+            self._print("  ✅ End-to-end workflow robustness")
+        finally:
+            if self._batcher is not None:
+                self._batcher.close()
+                self._batcher = None
+            self.session.close()
 
 if __name__ == "__main__":
-    demo = RobustAPIDemo()
+    parser = argparse.ArgumentParser(description="TokenTrust Robust API Demo")
+    parser.add_argument("--quiet", action="store_true",
+                        help="skip JSON request/response dumps and the start prompt (benchmark/CI runs)")
+    args = parser.parse_args()
+    
+    demo = RobustAPIDemo(verbose=not args.quiet)
     
     print("🚀 Starting TokenTrust Robust API Demo")
     print("Make sure the API server is running on http://localhost:8000")
     
-    input("\nPress Enter to start the demo...")
+    if not args.quiet:
+        input("\nPress Enter to start the demo...")
     
     try:
         demo.run_full_demo()
@@ -4,27 +4,39 @@ Proper HTTP status codes, error handling, and workflow management
 """
 
 from fastapi import APIRouter, HTTPException, status, Request
-from pydantic import BaseModel, Field, validator
-from typing import Dict, Any, Optional, List
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+from typing import Dict, Any, Literal, Optional, List
+from dataclasses import dataclass
 from datetime import datetime
+import functools
+import re
 import uuid
+from clock import now_iso
 
 from helpers import (
-    storage, write_audit_entry, create_event, freeze_token, unfreeze_token, revoke_token,
-    get_token_status, get_event_summary, classify_risk_score, get_decision_for_risk_level,
+    AuditEntry, Event, storage, write_audit_entry, create_event, transition,
+    freeze_token, unfreeze_token, revoke_token,
+    get_token_status, get_token_summary, get_event_summary, classify_risk_score, get_decision_for_risk_level,
     parse_llm_response, validate_llm_recommendation
 )
 from config import (
     EVENT_STATUS_APPROVED, EVENT_STATUS_WAITING_VERIFICATION,
     EVENT_STATUS_VERIFIED_SUCCESS, EVENT_STATUS_VERIFIED_FAILURE,
     AUDIT_ACTION_ANALYZE, AUDIT_ACTION_VERIFY, AUDIT_ACTION_TRIAGE,
-    TOKEN_STATUS_ACTIVE, TOKEN_STATUS_FROZEN, TOKEN_STATUS_REVOKED
+    TOKEN_STATUS_ACTIVE, TOKEN_STATUS_FROZEN, TOKEN_STATUS_REVOKED,
+    BATCH_MAX_REQUESTS, TEST_FIXTURES_ENABLED
 )
 
 router = APIRouter()
 
 # Request Models
+# Request bodies are validated once by pydantic-core and never mutated afterwards
+_REQUEST_MODEL_CONFIG = ConfigDict(frozen=True)
+
 class AnalyzeRequest(BaseModel):
+    model_config = _REQUEST_MODEL_CONFIG
+
     token_id: str = Field(..., description="Token identifier")
     merchant_id: str = Field(..., description="Merchant identifier")
     amount: float = Field(..., gt=0, description="Transaction amount (must be positive)")
@@ -32,25 +44,46 @@ class AnalyzeRequest(BaseModel):
     metadata: Optional[Dict[str, Any]] = Field(default=None, description="Optional metadata")
 
 class MerchantResponse(BaseModel):
+    model_config = _REQUEST_MODEL_CONFIG
+
     event_id: str = Field(..., description="Event identifier")
     user_response: str = Field(..., description="User response to verification")
     verification_method: str = Field(..., description="Method used for verification")
     evidence: Optional[Dict[str, Any]] = Field(default=None, description="Verification evidence")
 
 class TriageRequest(BaseModel):
+    model_config = _REQUEST_MODEL_CONFIG
+
     event_id: str = Field(..., description="Event identifier")
-    agent_decision: str = Field(..., description="Agent's decision")
+    # Checked against the Literal by pydantic-core; the validator only normalizes case
+    agent_decision: Literal["approve", "challenge", "challenge_high", "revoke"] = Field(..., description="Agent's decision")
     reasoning: Optional[str] = Field(default=None, description="Agent's reasoning")
 
-    @validator('agent_decision')
-    def validate_agent_decision(cls, v):
-        valid_decisions = ['approve', 'challenge', 'challenge_high', 'revoke']
-        if v.lower() not in valid_decisions:
-            raise ValueError(f'agent_decision must be one of: {valid_decisions}')
-        return v.lower()
+    @field_validator('agent_decision', mode='before')
+    @classmethod
+    def lowercase_agent_decision(cls, v):
+        return v.lower() if isinstance(v, str) else v
+
+class RevokedTokenFixture(BaseModel):
+    model_config = _REQUEST_MODEL_CONFIG
+
+    token_id: str = Field(..., description="Token to put directly into the revoked state")
+
+class BatchRequestItem(BaseModel):
+    method: str = Field(..., description="HTTP method of the sub-request")
+    path: str = Field(..., description="Endpoint path relative to /v2, e.g. /analyze")
+    body: Optional[Dict[str, Any]] = Field(default=None, description="Sub-request JSON body")
+
+class BatchRequest(BaseModel):
+    requests: List[BatchRequestItem] = Field(..., min_length=1, max_length=BATCH_MAX_REQUESTS, description="Sub-requests, executed in order")
 
 # Response Models
+# Built once per request from already-validated values and never mutated afterwards
+_RESPONSE_MODEL_CONFIG = ConfigDict(frozen=True)
+
 class AnalyzeResponse(BaseModel):
+    model_config = _RESPONSE_MODEL_CONFIG
+
     event_id: str
     decision: str
     status: str
@@ -60,6 +93,8 @@ class AnalyzeResponse(BaseModel):
     message: str
 
 class MerchantResponseResult(BaseModel):
+    model_config = _RESPONSE_MODEL_CONFIG
+
     event_id: str
     final_status: str
     token_status: str
@@ -67,13 +102,60 @@ class MerchantResponseResult(BaseModel):
     message: str
 
 class TriageResponse(BaseModel):
+    model_config = _RESPONSE_MODEL_CONFIG
+
     event_id: str
     action_taken: str
     token_status: str
     message: str
 
+# Error handling shared by the workflow endpoints
+def audited_endpoint(action: str, target_field: str, failure_reason: str, error_detail: str):
+    """
+    Audit unexpected handler errors and turn them into a 500
+    
+    HTTPExceptions pass through untouched; any other exception writes a
+    `failure_reason` audit entry against the request body's `target_field`
+    and is re-raised as HTTP 500 with `error_detail`.
+    """
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await handler(*args, **kwargs)
+            except HTTPException:
+                raise
+            except Exception as e:
+                body = args[0] if args else next(iter(kwargs.values()), None)
+                write_audit_entry(
+                    action=action,
+                    actor="system",
+                    target=getattr(body, target_field, "unknown"),
+                    reason=f"{failure_reason}: {str(e)}"
+                )
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"{error_detail}: {str(e)}"
+                )
+        return wrapper
+    return decorator
+
 # 1. Analyze/Ingest Endpoint
+@dataclass(frozen=True, slots=True)
+class _RiskPolicy:
+    freeze: bool        # freeze the token pending verification
+    auto_revoke: bool   # mark the frozen token as an auto-revoke candidate
+    message: str
+
+# Token handling and response message for each risk level
+_RISK_POLICY = {
+    "LOW": _RiskPolicy(freeze=False, auto_revoke=False, message="Transaction approved - low risk"),
+    "MEDIUM": _RiskPolicy(freeze=True, auto_revoke=False, message="Transaction requires verification - medium risk, token frozen"),
+    "HIGH": _RiskPolicy(freeze=True, auto_revoke=True, message="Transaction requires verification - high risk, token frozen, auto-revoke candidate"),
+}
+
 @router.post("/analyze", response_model=AnalyzeResponse, status_code=status.HTTP_200_OK)
+@audited_endpoint(AUDIT_ACTION_ANALYZE, "token_id", "Analysis failed", "Internal error during transaction analysis")
 async def analyze_transaction(request: AnalyzeRequest):
     """
     Analyze transaction risk and manage token state
@@ -84,95 +166,83 @@ async def analyze_transaction(request: AnalyzeRequest):
     - Manages token state (freeze for MEDIUM/HIGH risk)
     - Returns decision with proper HTTP status
     """
-    try:
-        # Validate current token state
-        current_token_status = get_token_status(request.token_id)
-        if current_token_status == TOKEN_STATUS_REVOKED:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Token {request.token_id} is revoked and cannot be used"
-            )
-        
-        # Create event with risk classification
-        event = create_event(
-            token_id=request.token_id,
-            merchant_id=request.merchant_id,
-            amount=request.amount,
-            risk_score=request.risk_score
+    # Validate current token state
+    current_token_status = get_token_status(request.token_id)
+    if current_token_status == TOKEN_STATUS_REVOKED:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"Token {request.token_id} is revoked and cannot be used"
         )
-        
-        risk_level = classify_risk_score(request.risk_score)
-        
-        # Audit the analysis
-        write_audit_entry(
-            action=AUDIT_ACTION_ANALYZE,
+    
+    # Create event with risk classification
+    event = create_event(
+        token_id=request.token_id,
+        merchant_id=request.merchant_id,
+        amount=request.amount,
+        risk_score=request.risk_score
+    )
+    
+    risk_level = classify_risk_score(request.risk_score)
+    policy = _RISK_POLICY[risk_level]
+    
+    # Audit the analysis
+    write_audit_entry(
+        action=AUDIT_ACTION_ANALYZE,
+        actor="system",
+        target=event.event_id,
+        reason=f"Transaction analysis - Risk Level: {risk_level}",
+        details={
+            "token_id": request.token_id,
+            "merchant_id": request.merchant_id,
+            "amount": request.amount,
+            "risk_score": request.risk_score,
+            "risk_level": risk_level,
+            "metadata": request.metadata
+        }
+    )
+    
+    # Handle token state based on risk level; a LOW risk event leaves it unchanged
+    final_token_status = current_token_status
+    if policy.freeze:
+        # Freeze token for further verification
+        freeze_result = freeze_token(
+            token_id=request.token_id,
+            reason=f"Risk level {risk_level} detected",
             actor="system",
-            target=event.event_id,
-            reason=f"Transaction analysis - Risk Level: {risk_level}",
-            details={
-                "token_id": request.token_id,
-                "merchant_id": request.merchant_id,
-                "amount": request.amount,
-                "risk_score": request.risk_score,
-                "risk_level": risk_level,
-                "metadata": request.metadata
-            }
+            auto_revoke_candidate=policy.auto_revoke
         )
         
-        # Handle token state based on risk level
-        if risk_level in ["MEDIUM", "HIGH"]:
-            # Freeze token for further verification
-            freeze_result = freeze_token(
-                token_id=request.token_id,
-                reason=f"Risk level {risk_level} detected",
-                actor="system",
-                auto_revoke_candidate=(risk_level == "HIGH")
+        if not freeze_result["success"]:
+            # Token couldn't be frozen (might be revoked)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Cannot freeze token: {freeze_result.get('error', 'Unknown error')}"
             )
-            
-            if not freeze_result["success"]:
-                # Token couldn't be frozen (might be revoked)
-                raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail=f"Cannot freeze token: {freeze_result.get('error', 'Unknown error')}"
-                )
-        
-        # Get final token status
-        final_token_status = get_token_status(request.token_id)
-        
-        # Prepare response message
-        if risk_level == "LOW":
-            message = "Transaction approved - low risk"
-        elif risk_level == "MEDIUM":
-            message = "Transaction requires verification - medium risk, token frozen"
-        else:  # HIGH
-            message = "Transaction requires verification - high risk, token frozen, auto-revoke candidate"
-        
-        return AnalyzeResponse(
-            event_id=event.event_id,
-            decision=event.decision,
-            status=event.status,
-            token_status=final_token_status,
-            risk_level=risk_level,
-            auto_revoke_candidate=event.auto_revoke_candidate,
-            message=message
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        write_audit_entry(
-            action=AUDIT_ACTION_ANALYZE,
-            actor="system",
-            target=request.token_id,
-            reason=f"Analysis failed: {str(e)}"
-        )
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Internal error during transaction analysis: {str(e)}"
-        )
+        final_token_status = freeze_result["token_status"]
+    
+    return AnalyzeResponse(
+        event_id=event.event_id,
+        decision=event.decision,
+        status=event.status,
+        token_status=final_token_status,
+        risk_level=risk_level,
+        auto_revoke_candidate=event.auto_revoke_candidate,
+        message=policy.message
+    )
 
 # 2. Merchant Response Endpoint
+# Whole-word match on any success indicator: the response is split into words
+# once and checked against the set, so "unauthorized", "invalid" or "disapprove"
+# no longer pass as success the way a substring match let them. The failure
+# indicators ("no", "deny", "fraud", ...) need no check since they resolve to
+# failure like an ambiguous response does
+_WORD_RE = re.compile(r"[a-z]+")
+_SUCCESS_INDICATORS = frozenset({
+    "yes", "approve", "approved", "authorized", "legitimate", "valid", "correct"
+})
+
 @router.post("/merchant-response", response_model=MerchantResponseResult, status_code=status.HTTP_200_OK)
+@audited_endpoint(AUDIT_ACTION_VERIFY, "event_id", "Merchant response processing failed", "Internal error processing merchant response")
 async def handle_merchant_response(response: MerchantResponse):
     """
     Process merchant's verification response
@@ -181,136 +251,165 @@ async def handle_merchant_response(response: MerchantResponse):
     - Manages token state (unfreeze on success, revoke on failure/suspicious)
     - Returns final status with proper HTTP codes
     """
-    try:
-        # Get the event
-        event = storage.get_event(response.event_id)
-        if not event:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Event {response.event_id} not found"
-            )
-        
-        # Validate event can be updated
-        if event.status not in [EVENT_STATUS_WAITING_VERIFICATION]:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail=f"Event {response.event_id} is not waiting for verification (current status: {event.status})"
-            )
-        
-        # Parse user response (simulate LLM analysis here)
-        # In real implementation, this would call the VerificationAgent
-        user_response_lower = response.user_response.lower().strip()
-        
-        verification_successful = False
-        final_event_status = EVENT_STATUS_VERIFIED_FAILURE
-        
-        # Simple verification logic (enhance with actual LLM analysis)
-        success_indicators = ["yes", "approve", "authorized", "legitimate", "valid", "correct"]
-        failure_indicators = ["no", "deny", "fraud", "suspicious", "unauthorized", "invalid", "wrong"]
-        
-        if any(indicator in user_response_lower for indicator in success_indicators):
-            verification_successful = True
-            final_event_status = EVENT_STATUS_VERIFIED_SUCCESS
-        elif any(indicator in user_response_lower for indicator in failure_indicators):
-            verification_successful = False
-            final_event_status = EVENT_STATUS_VERIFIED_FAILURE
-        else:
-            # Ambiguous response - default to failure for security
-            verification_successful = False
-            final_event_status = EVENT_STATUS_VERIFIED_FAILURE
-        
-        # Update event
-        event.status = final_event_status
-        event.verified_by = f"{response.verification_method}:merchant_response"
-        event.verification_evidence = {
-            "user_response": response.user_response,
+    # Get the event
+    event = storage.get_event(response.event_id)
+    if not event:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Event {response.event_id} not found"
+        )
+    
+    # Validate event can be updated
+    if event.status not in [EVENT_STATUS_WAITING_VERIFICATION]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Event {response.event_id} is not waiting for verification (current status: {event.status})"
+        )
+    
+    # Parse user response (simulate LLM analysis here)
+    # In real implementation, this would call the VerificationAgent
+    # Simple verification logic (enhance with actual LLM analysis): any success
+    # indicator verifies; failure indicators and ambiguous responses both fail
+    verification_successful = not _SUCCESS_INDICATORS.isdisjoint(
+        _WORD_RE.findall(response.user_response.lower())
+    )
+    final_event_status = (
+        EVENT_STATUS_VERIFIED_SUCCESS if verification_successful else EVENT_STATUS_VERIFIED_FAILURE
+    )
+    
+    # Update event
+    event.status = final_event_status
+    event.verified_by = f"{response.verification_method}:merchant_response"
+    event.verification_evidence = {
+        "user_response": response.user_response,
+        "verification_method": response.verification_method,
+        "evidence": response.evidence,
+        "processed_at": datetime.utcnow().isoformat()
+    }
+    storage.save_event(event)
+    
+    # Audit the verification
+    write_audit_entry(
+        action=AUDIT_ACTION_VERIFY,
+        actor="merchant_user",
+        target=response.event_id,
+        reason=f"Merchant verification: {'Success' if verification_successful else 'Failure'}",
+        details={
+            "token_id": event.token_id,
             "verification_method": response.verification_method,
-            "evidence": response.evidence,
-            "processed_at": datetime.utcnow().isoformat()
+            "verification_successful": verification_successful,
+            "user_response": response.user_response
         }
-        storage.save_event(event)
-        
-        # Audit the verification
-        write_audit_entry(
-            action=AUDIT_ACTION_VERIFY,
-            actor="merchant_user",
-            target=response.event_id,
-            reason=f"Merchant verification: {'Success' if verification_successful else 'Failure'}",
-            details={
-                "token_id": event.token_id,
-                "verification_method": response.verification_method,
-                "verification_successful": verification_successful,
-                "user_response": response.user_response
-            }
+    )
+    
+    # Handle token state based on verification outcome
+    if verification_successful:
+        # Unfreeze token on successful verification
+        unfreeze_result = unfreeze_token(
+            token_id=event.token_id,
+            actor="verification_system",
+            reason="Merchant verification successful"
         )
+        final_token_status = unfreeze_result["token_status"]
         
-        # Handle token state based on verification outcome
-        if verification_successful:
-            # Unfreeze token on successful verification
-            unfreeze_result = unfreeze_token(
-                token_id=event.token_id,
-                actor="verification_system",
-                reason="Merchant verification successful"
-            )
-            
-            if not unfreeze_result["success"]:
-                # Log warning but don't fail the response
-                write_audit_entry(
-                    action=AUDIT_ACTION_VERIFY,
-                    actor="system",
-                    target=event.token_id,
-                    reason=f"Warning: Could not unfreeze token after successful verification: {unfreeze_result.get('error')}"
-                )
-        else:
-            # Revoke token on failed verification or if it was auto-revoke candidate
-            revoke_result = revoke_token(
-                token_id=event.token_id,
-                actor="verification_system",
-                reason="Merchant verification failed"
+        if not unfreeze_result["success"]:
+            # Log warning but don't fail the response
+            write_audit_entry(
+                action=AUDIT_ACTION_VERIFY,
+                actor="system",
+                target=event.token_id,
+                reason=f"Warning: Could not unfreeze token after successful verification: {unfreeze_result.get('error')}"
             )
-            
-            if not revoke_result["success"]:
-                # This shouldn't happen, but log it
-                write_audit_entry(
-                    action=AUDIT_ACTION_VERIFY,
-                    actor="system",
-                    target=event.token_id,
-                    reason=f"Warning: Could not revoke token after failed verification: {revoke_result.get('error')}"
-                )
-        
-        # Get final token status
-        final_token_status = get_token_status(event.token_id)
-        
-        # Prepare response message
-        if verification_successful:
-            message = "Verification successful - token unfrozen, transaction can proceed"
-        else:
-            message = "Verification failed - token revoked for security"
-        
-        return MerchantResponseResult(
-            event_id=response.event_id,
-            final_status=final_event_status,
-            token_status=final_token_status,
-            verification_successful=verification_successful,
-            message=message
+    else:
+        # Revoke token on failed verification or if it was auto-revoke candidate
+        revoke_result = revoke_token(
+            token_id=event.token_id,
+            actor="verification_system",
+            reason="Merchant verification failed"
         )
+        final_token_status = revoke_result["token_status"]
         
-    except HTTPException:
-        raise
-    except Exception as e:
-        write_audit_entry(
-            action=AUDIT_ACTION_VERIFY,
-            actor="system",
-            target=response.event_id if hasattr(response, 'event_id') else "unknown",
-            reason=f"Merchant response processing failed: {str(e)}"
-        )
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Internal error processing merchant response: {str(e)}"
-        )
+        if not revoke_result["success"]:
+            # This shouldn't happen, but log it
+            write_audit_entry(
+                action=AUDIT_ACTION_VERIFY,
+                actor="system",
+                target=event.token_id,
+                reason=f"Warning: Could not revoke token after failed verification: {revoke_result.get('error')}"
+            )
+    
+    # Prepare response message
+    if verification_successful:
+        message = "Verification successful - token unfrozen, transaction can proceed"
+    else:
+        message = "Verification failed - token revoked for security"
+    
+    return MerchantResponseResult(
+        event_id=response.event_id,
+        final_status=final_event_status,
+        token_status=final_token_status,
+        verification_successful=verification_successful,
+        message=message
+    )
 
 # 3. Agent Triage Endpoint
+# One handler per agent decision: each applies its token action + event update
+# through transition() and returns (action_taken, message, token_status). The
+# lifecycle helpers are idempotent, so "unfreeze if frozen" / "freeze if active"
+# need no status lookup first; the result says what happened.
+def _triage_approve(event: Event, reasoning: Optional[str]):
+    # Agent approves - unfreeze token if frozen, event approved
+    result = transition(
+        event, EVENT_STATUS_APPROVED, unfreeze_token,
+        actor="ai_agent",
+        reason=f"Agent approval: {reasoning or 'AI agent determined transaction is safe'}"
+    )
+    if result.get("action") == "unfrozen":
+        return "approved_unfrozen", "Agent approved transaction - token unfrozen", result["token_status"]
+    return "approved_no_action", "Agent approved transaction - no token action needed", result["token_status"]
+
+def _triage_challenge(event: Event, reasoning: Optional[str]):
+    # Agent wants more verification - ensure token is frozen, event keeps waiting
+    result = transition(
+        event, EVENT_STATUS_WAITING_VERIFICATION, freeze_token,
+        reason=f"Agent requested additional verification: {reasoning or 'AI agent requires more verification'}",
+        actor="ai_agent",
+        auto_revoke_candidate=False
+    )
+    if result.get("action") == "frozen":
+        return "challenge_frozen", "Agent requires additional verification - token frozen", result["token_status"]
+    return "challenge_already_frozen", "Agent requires additional verification - token remains frozen", result["token_status"]
+
+def _triage_challenge_high(event: Event, reasoning: Optional[str]):
+    # Agent sees high risk - freeze and mark event for auto-revoke
+    event.auto_revoke_candidate = True
+    result = transition(
+        event, EVENT_STATUS_WAITING_VERIFICATION, freeze_token,
+        reason=f"Agent identified high risk: {reasoning or 'AI agent detected high risk indicators'}",
+        actor="ai_agent",
+        auto_revoke_candidate=True
+    )
+    return "high_risk_frozen", "Agent identified high risk - token frozen as revoke candidate", result["token_status"]
+
+def _triage_revoke(event: Event, reasoning: Optional[str]):
+    # Agent recommends immediate revocation - event verified failure
+    result = transition(
+        event, EVENT_STATUS_VERIFIED_FAILURE, revoke_token,
+        actor="ai_agent",
+        reason=f"Agent recommended revocation: {reasoning or 'AI agent determined token should be revoked'}"
+    )
+    return "revoked", "Agent recommended revocation - token revoked", result["token_status"]
+
+# agent_decision -> handler, one per value TriageRequest.agent_decision accepts
+_TRIAGE_HANDLERS = {
+    "approve": _triage_approve,
+    "challenge": _triage_challenge,
+    "challenge_high": _triage_challenge_high,
+    "revoke": _triage_revoke,
+}
+
 @router.post("/triage", response_model=TriageResponse, status_code=status.HTTP_200_OK)
+@audited_endpoint(AUDIT_ACTION_TRIAGE, "event_id", "Agent triage failed", "Internal error during agent triage")
 async def agent_triage(request: TriageRequest):
     """
     Agent triage for complex decisions
@@ -319,126 +418,40 @@ async def agent_triage(request: TriageRequest):
     - Can override standard workflow based on agent analysis
     - Manages token lifecycle based on agent recommendations
     """
-    try:
-        # Get the event
-        event = storage.get_event(request.event_id)
-        if not event:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Event {request.event_id} not found"
-            )
-        
-        # Validate agent decision
-        agent_decision = validate_llm_recommendation(request.agent_decision)
-        
-        # Audit the triage
-        write_audit_entry(
-            action=AUDIT_ACTION_TRIAGE,
-            actor="ai_agent",
-            target=request.event_id,
-            reason=f"Agent triage decision: {agent_decision}",
-            details={
-                "token_id": event.token_id,
-                "agent_decision": agent_decision,
-                "reasoning": request.reasoning,
-                "original_decision": event.decision
-            }
-        )
-        
-        action_taken = "none"
-        message = ""
-        
-        # Handle agent decision
-        if agent_decision == "approve":
-            # Agent approves - unfreeze token if frozen
-            if get_token_status(event.token_id) == TOKEN_STATUS_FROZEN:
-                unfreeze_result = unfreeze_token(
-                    token_id=event.token_id,
-                    actor="ai_agent",
-                    reason=f"Agent approval: {request.reasoning or 'AI agent determined transaction is safe'}"
-                )
-                action_taken = "approved_unfrozen"
-                message = "Agent approved transaction - token unfrozen"
-            else:
-                action_taken = "approved_no_action"
-                message = "Agent approved transaction - no token action needed"
-            
-            # Update event status to approved
-            event.status = EVENT_STATUS_APPROVED
-            storage.save_event(event)
-            
-        elif agent_decision == "challenge":
-            # Agent wants more verification - ensure token is frozen
-            if get_token_status(event.token_id) == TOKEN_STATUS_ACTIVE:
-                freeze_result = freeze_token(
-                    token_id=event.token_id,
-                    reason=f"Agent requested additional verification: {request.reasoning or 'AI agent requires more verification'}",
-                    actor="ai_agent",
-                    auto_revoke_candidate=False
-                )
-                action_taken = "challenge_frozen"
-                message = "Agent requires additional verification - token frozen"
-            else:
-                action_taken = "challenge_already_frozen"
-                message = "Agent requires additional verification - token remains frozen"
-            
-            # Keep event in waiting verification state
-            event.status = EVENT_STATUS_WAITING_VERIFICATION
-            storage.save_event(event)
-            
-        elif agent_decision == "challenge_high":
-            # Agent sees high risk - freeze and mark for auto-revoke
-            freeze_result = freeze_token(
-                token_id=event.token_id,
-                reason=f"Agent identified high risk: {request.reasoning or 'AI agent detected high risk indicators'}",
-                actor="ai_agent",
-                auto_revoke_candidate=True
-            )
-            action_taken = "high_risk_frozen"
-            message = "Agent identified high risk - token frozen as revoke candidate"
-            
-            # Update event for high risk
-            event.status = EVENT_STATUS_WAITING_VERIFICATION
-            event.auto_revoke_candidate = True
-            storage.save_event(event)
-            
-        elif agent_decision == "revoke":
-            # Agent recommends immediate revocation
-            revoke_result = revoke_token(
-                token_id=event.token_id,
-                actor="ai_agent",
-                reason=f"Agent recommended revocation: {request.reasoning or 'AI agent determined token should be revoked'}"
-            )
-            action_taken = "revoked"
-            message = "Agent recommended revocation - token revoked"
-            
-            # Update event to verified failure
-            event.status = EVENT_STATUS_VERIFIED_FAILURE
-            storage.save_event(event)
-        
-        # Get final token status
-        final_token_status = get_token_status(event.token_id)
-        
-        return TriageResponse(
-            event_id=request.event_id,
-            action_taken=action_taken,
-            token_status=final_token_status,
-            message=message
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        write_audit_entry(
-            action=AUDIT_ACTION_TRIAGE,
-            actor="system",
-            target=request.event_id if hasattr(request, 'event_id') else "unknown",
-            reason=f"Agent triage failed: {str(e)}"
-        )
+    # Get the event
+    event = storage.get_event(request.event_id)
+    if not event:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Internal error during agent triage: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Event {request.event_id} not found"
         )
+    
+    # Validate agent decision
+    agent_decision = validate_llm_recommendation(request.agent_decision)
+    
+    # Audit the triage
+    write_audit_entry(
+        action=AUDIT_ACTION_TRIAGE,
+        actor="ai_agent",
+        target=request.event_id,
+        reason=f"Agent triage decision: {agent_decision}",
+        details={
+            "token_id": event.token_id,
+            "agent_decision": agent_decision,
+            "reasoning": request.reasoning,
+            "original_decision": event.decision
+        }
+    )
+    
+    # Apply the decision
+    action_taken, message, final_token_status = _TRIAGE_HANDLERS[agent_decision](event, request.reasoning)
+    
+    return TriageResponse(
+        event_id=request.event_id,
+        action_taken=action_taken,
+        token_status=final_token_status,
+        message=message
+    )
 
 # 4. Status Check Endpoints
 @router.get("/event/{event_id}", status_code=status.HTTP_200_OK)
@@ -450,62 +463,119 @@ async def get_event_status(event_id: str):
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Event {event_id} not found"
         )
-    return event_summary
+    # Encoded by orjson in one call, datetimes included (see get_token_status_endpoint)
+    return ORJSONResponse(event_summary)
 
 @router.get("/token/{token_id}/status", status_code=status.HTTP_200_OK)
 async def get_token_status_endpoint(token_id: str):
     """Get current token status"""
-    token_state = storage.get_token(token_id)
-    if not token_state:
-        return {
-            "token_id": token_id,
-            "status": TOKEN_STATUS_ACTIVE,
-            "message": "Token not found in system - default status"
-        }
-    
+    # Returned as a response directly: orjson writes the datetimes itself, in
+    # isoformat(), without a jsonable_encoder pass over the dict
+    return ORJSONResponse(get_token_summary(token_id))
+
+# 5. Admin/Debug Endpoints
+def _audit_entry_to_dict(entry: AuditEntry) -> Dict[str, Any]:
     return {
-        "token_id": token_id,
-        "status": token_state.status,
-        "created_at": token_state.created_at.isoformat() if token_state.created_at else None,
-        "frozen_at": token_state.frozen_at.isoformat() if token_state.frozen_at else None,
-        "revoked_at": token_state.revoked_at.isoformat() if token_state.revoked_at else None,
-        "reason": token_state.reason,
-        "auto_revoke_candidate": token_state.auto_revoke_candidate
+        "audit_id": entry.audit_id,
+        "action": entry.action,
+        "actor": entry.actor,
+        "target": entry.target,
+        "reason": entry.reason,
+        "timestamp": entry.timestamp,
+        "details": entry.details
     }
 
-# 5. Admin/Debug Endpoints
 @router.get("/audit/{target}", status_code=status.HTTP_200_OK)
 async def get_audit_log(target: str, limit: int = 50):
     """Get audit log entries for a specific target"""
+    # Only the `limit` most recent entries are read from the per-target index
     matching_entries = [
-        {
-            "audit_id": entry.audit_id,
-            "action": entry.action,
-            "actor": entry.actor,
-            "target": entry.target,
-            "reason": entry.reason,
-            "timestamp": entry.timestamp.isoformat(),
-            "details": entry.details
-        }
-        for entry in storage.audit_log
-        if entry.target == target
-    ][-limit:]  # Get most recent entries
+        _audit_entry_to_dict(entry) for entry in storage.get_audit_entries(target, limit)
+    ]
     
-    return {
+    # Serialized by orjson in one call (datetimes included), skipping jsonable_encoder
+    return ORJSONResponse({
         "target": target,
         "entries": matching_entries,
         "total_entries": len(matching_entries)
-    }
+    })
 
 @router.get("/health", status_code=status.HTTP_200_OK)
 async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": now_iso(),
         "storage_stats": {
             "tokens": len(storage.tokens),
             "events": len(storage.events),
             "audit_entries": len(storage.audit_log)
         }
-    }
\ No newline at end of file
+    }
+
+# 6. Test Fixtures
+@router.post("/test/fixture/revoked-token", status_code=status.HTTP_200_OK)
+async def revoked_token_fixture(request: RevokedTokenFixture):
+    """
+    Put a token straight into the revoked state for integration tests and demos
+    
+    - Only served when TOKENTRUST_TEST_FIXTURES is set (404 otherwise)
+    - Idempotent: an already revoked token stays revoked
+    - Replaces the analyze + failed merchant-response round-trips otherwise needed
+    """
+    if not TEST_FIXTURES_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Test fixtures are disabled"
+        )
+    
+    result = revoke_token(
+        token_id=request.token_id,
+        actor="test_fixture",
+        reason="Test fixture: token pre-revoked"
+    )
+    return {
+        "token_id": request.token_id,
+        "token_status": result["token_status"],
+        "action": result.get("action")
+    }
+
+# 7. Batch Endpoint
+# (method, path) -> (request model, handler) for the sub-requests /batch accepts
+_BATCH_HANDLERS = {
+    ("POST", "/analyze"): (AnalyzeRequest, analyze_transaction),
+    ("POST", "/merchant-response"): (MerchantResponse, handle_merchant_response),
+    ("POST", "/triage"): (TriageRequest, agent_triage),
+    ("POST", "/test/fixture/revoked-token"): (RevokedTokenFixture, revoked_token_fixture),
+}
+
+@router.post("/batch", status_code=status.HTTP_200_OK)
+async def batch(request: BatchRequest):
+    """
+    Execute several API calls in a single round-trip
+
+    - Sub-requests run sequentially, in the order given
+    - Each sub-request gets its own status code; one failing does not abort the rest
+    - Returns responses in the same order as the requests
+    """
+    responses = []
+    for item in request.requests:
+        entry = _BATCH_HANDLERS.get((item.method.upper(), item.path))
+        if entry is None:
+            responses.append({
+                "status": status.HTTP_404_NOT_FOUND,
+                "body": {"detail": f"{item.method.upper()} {item.path} is not supported in a batch"}
+            })
+            continue
+
+        model, handler = entry
+        try:
+            result = await handler(model(**(item.body or {})))
+        except ValidationError as e:
+            responses.append({"status": status.HTTP_422_UNPROCESSABLE_ENTITY, "body": {"detail": str(e)}})
+        except HTTPException as e:
+            responses.append({"status": e.status_code, "body": {"detail": e.detail}})
+        else:
+            responses.append({"status": status.HTTP_200_OK, "body": result})
+
+    return {"responses": responses}
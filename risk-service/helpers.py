@@ -3,11 +3,17 @@ TokenTrust Core Helpers
 Risk classification, token lifecycle, audit logging, and data models
 """
 
+import asyncio
+import os
 import uuid
 import json
+from collections import defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Callable, Dict, Any, Optional, List
 from dataclasses import dataclass, asdict
+from cachetools import TTLCache
 from config import (
     APPROVE_MAX, MEDIUM_MIN, MEDIUM_MAX, HIGH_MIN,
     TOKEN_STATUS_ACTIVE, TOKEN_STATUS_FROZEN, TOKEN_STATUS_REVOKED,
@@ -16,11 +22,34 @@ from config import (
     DECISION_APPROVE, DECISION_CHALLENGE, DECISION_CHALLENGE_HIGH,
     VALID_LLM_RECOMMENDATIONS,
     AUDIT_ACTION_FREEZE, AUDIT_ACTION_UNFREEZE, AUDIT_ACTION_REVOKE,
-    AUDIT_ACTION_ANALYZE, AUDIT_ACTION_VERIFY, AUDIT_ACTION_TRIAGE
+    AUDIT_ACTION_ANALYZE, AUDIT_ACTION_VERIFY, AUDIT_ACTION_TRIAGE,
+    AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL_MS, AUDIT_INDEX_MAX_PER_TARGET,
+    AUDIT_LOG_MAX_ENTRIES, AUDIT_SPILL_PATH,
+    STATUS_CACHE_MAXSIZE, STATUS_CACHE_TTL_SECONDS, UUID_POOL_SIZE
 )
 
+# ID Generation
+_uuid_pool: deque = deque()
+
+def new_id() -> str:
+    """
+    New random (version 4) UUID string, same format as str(uuid.uuid4())
+    
+    The randomness for UUID_POOL_SIZE ids is read with a single os.urandom call
+    and the ids are handed out from a pool, refilled when it runs dry.
+    """
+    try:
+        return _uuid_pool.popleft()
+    except IndexError:
+        buf = os.urandom(16 * UUID_POOL_SIZE)
+        _uuid_pool.extend(
+            str(uuid.UUID(bytes=buf[i:i + 16], version=4)) for i in range(0, len(buf), 16)
+        )
+        return _uuid_pool.popleft()
+
 # Data Models
-@dataclass
+# Slotted: one instance per token/event/audit entry, so skip the per-instance __dict__
+@dataclass(slots=True)
 class TokenState:
     token_id: str
     status: str = TOKEN_STATUS_ACTIVE
@@ -34,7 +63,7 @@ class TokenState:
         if self.created_at is None:
             self.created_at = datetime.utcnow()
 
-@dataclass
+@dataclass(slots=True)
 class Event:
     event_id: str
     token_id: str
@@ -56,7 +85,7 @@ class Event:
         if self.updated_at is None:
             self.updated_at = now
 
-@dataclass
+@dataclass(slots=True)
 class AuditEntry:
     audit_id: str
     action: str
@@ -68,14 +97,81 @@ class AuditEntry:
     
     def __post_init__(self):
         if not self.audit_id:
-            self.audit_id = str(uuid.uuid4())
+            self.audit_id = new_id()
+
+class _SummaryCachedDict(dict):
+    """Record dict that evicts the matching cached summary on every write, so
+    direct mutation (e.g. storage.tokens.clear()) never leaves stale responses"""
+    
+    def __init__(self, summary_cache: TTLCache):
+        super().__init__()
+        self.summary_cache = summary_cache
+    
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.summary_cache.pop(key, None)
+    
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self.summary_cache.pop(key, None)
+    
+    def setdefault(self, key, default=None):
+        self.summary_cache.pop(key, None)
+        return super().setdefault(key, default)
+    
+    def pop(self, key, *default):
+        self.summary_cache.pop(key, None)
+        return super().pop(key, *default)
+    
+    def popitem(self):
+        key, value = super().popitem()
+        self.summary_cache.pop(key, None)
+        return key, value
+    
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self.summary_cache.clear()
+    
+    def clear(self):
+        super().clear()
+        self.summary_cache.clear()
+
+def _spill_audit_entries(entries: List[AuditEntry]):
+    """Append evicted audit entries to AUDIT_SPILL_PATH as JSON lines"""
+    try:
+        with open(AUDIT_SPILL_PATH, "a", encoding="utf-8") as spill:
+            spill.write("".join(
+                json.dumps({**asdict(entry), "timestamp": entry.timestamp.isoformat()}, default=str) + "\n"
+                for entry in entries
+            ))
+    except OSError as e:
+        print(f"⚠️  Failed to spill {len(entries)} audit entries: {str(e)}")
 
 # In-memory storage (replace with DB in production)
 class Storage:
     def __init__(self):
-        self.tokens: Dict[str, TokenState] = {}
-        self.events: Dict[str, Event] = {}
-        self.audit_log: List[AuditEntry] = []
+        # Response dicts for the status GET endpoints, evicted whenever the record changes
+        self.event_summary_cache = TTLCache(maxsize=STATUS_CACHE_MAXSIZE, ttl=STATUS_CACHE_TTL_SECONDS)
+        self.token_summary_cache = TTLCache(maxsize=STATUS_CACHE_MAXSIZE, ttl=STATUS_CACHE_TTL_SECONDS)
+        self.tokens: Dict[str, TokenState] = _SummaryCachedDict(self.token_summary_cache)
+        self.events: Dict[str, Event] = _SummaryCachedDict(self.event_summary_cache)
+        # Token states are not capped like the audit log: a missing token reads as
+        # active, so evicting a frozen or revoked one would silently reinstate it
+        # Most recent AUDIT_LOG_MAX_ENTRIES entries; older ones are spilled on flush
+        self._audit_log: deque = deque()
+        # Audit entries written since the last flush, appended to the log as one batch
+        self._audit_pending: List[AuditEntry] = []
+        # target -> its most recent audit entries, so per-target queries skip the full log
+        self._audit_by_target: Dict[str, deque] = defaultdict(self._new_target_index)
+        self._audit_indexed = 0
+        # Spill file writes run on one background thread (FIFO, so file order
+        # matches eviction order); the future of the latest write is kept to wait on
+        self._audit_spill_executor: Optional[ThreadPoolExecutor] = None
+        self._audit_spill: Optional[Future] = None
+    
+    @staticmethod
+    def _new_target_index() -> deque:
+        return deque(maxlen=AUDIT_INDEX_MAX_PER_TARGET)
     
     def get_token(self, token_id: str) -> Optional[TokenState]:
         return self.tokens.get(token_id)
@@ -90,8 +186,76 @@ class Storage:
         event.updated_at = datetime.utcnow()
         self.events[event.event_id] = event
     
-    def add_audit_entry(self, entry: AuditEntry):
-        self.audit_log.append(entry)
+    @property
+    def audit_log(self) -> deque:
+        """Full audit log; pending entries are flushed first so reads see every write"""
+        self.flush_audit_entries()
+        return self._audit_log
+    
+    def add_audit_entry(self, entry: AuditEntry) -> int:
+        """Buffer an audit entry; returns how many are now pending"""
+        self._audit_pending.append(entry)
+        return len(self._audit_pending)
+    
+    def flush_audit_entries(self):
+        """Append pending audit entries to the log and echo them in one write"""
+        if not self._audit_pending:
+            return
+        batch, self._audit_pending = self._audit_pending, []
+        self._audit_log.extend(batch)
+        self._index_audit_entries(batch)
+        overflow = len(self._audit_log) - AUDIT_LOG_MAX_ENTRIES
+        if overflow > 0:
+            self._evict_audit_entries(overflow)
+        print("\n".join(
+            f"AUDIT: {entry.action} by {entry.actor} on {entry.target} - {entry.reason}"
+            for entry in batch
+        ))
+
+    def _index_audit_entries(self, entries: List[AuditEntry]):
+        for entry in entries:
+            self._audit_by_target[entry.target].append(entry)
+        self._audit_indexed += len(entries)
+    
+    def _evict_audit_entries(self, count: int):
+        """Drop the `count` oldest entries from the log and index, spilling them to disk"""
+        evicted = [self._audit_log.popleft() for _ in range(count)]
+        for entry in evicted:
+            entries = self._audit_by_target.get(entry.target)
+            # Oldest first in both, unless the per-target cap already dropped it
+            if entries and entries[0] is entry:
+                entries.popleft()
+            if not entries:
+                self._audit_by_target.pop(entry.target, None)
+        self._audit_indexed -= count
+        if AUDIT_SPILL_PATH:
+            if self._audit_spill_executor is None:
+                self._audit_spill_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audit-spill")
+            self._audit_spill = self._audit_spill_executor.submit(_spill_audit_entries, evicted)
+    
+    def wait_for_audit_spill(self):
+        """Block until every evicted entry handed to the spill thread is on disk"""
+        if self._audit_spill is not None:
+            self._audit_spill.result()
+    
+    def get_audit_entries(self, target: str, limit: int) -> List[AuditEntry]:
+        """Most recent `limit` audit entries for a target, oldest first"""
+        self.flush_audit_entries()
+        if self._audit_indexed != len(self._audit_log):
+            # The log was changed directly (e.g. cleared); rebuild the index from it
+            self._audit_by_target.clear()
+            self._audit_indexed = 0
+            self._index_audit_entries(self._audit_log)
+        entries = self._audit_by_target.get(target)
+        if not entries:
+            return []
+        if limit <= 0:
+            # Same as the list slice [-limit:] always gave: everything (or a head-trimmed copy)
+            return list(entries)[-limit:]
+        # Walk back from the newest entry, touching only `limit` of them
+        recent = list(islice(reversed(entries), limit))
+        recent.reverse()
+        return recent
 
 # Global storage instance
 storage = Storage()
@@ -137,11 +301,44 @@ def get_decision_for_risk_level(risk_level: str) -> str:
         return DECISION_CHALLENGE
 
 # 2. Audit Logging Helper
+_audit_flush_handle: Optional[asyncio.TimerHandle] = None
+_audit_flush_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def flush_audit_entries():
+    """Write every buffered audit entry to the log now"""
+    global _audit_flush_handle
+    if _audit_flush_handle is not None:
+        _audit_flush_handle.cancel()
+        _audit_flush_handle = None
+    storage.flush_audit_entries()
+
+def close_audit_log():
+    """Flush buffered audit entries and wait for pending spill writes (shutdown)"""
+    flush_audit_entries()
+    storage.wait_for_audit_spill()
+
+def _schedule_audit_flush():
+    """Flush buffered audit entries AUDIT_FLUSH_INTERVAL_MS from now, unless already scheduled"""
+    global _audit_flush_handle, _audit_flush_loop
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # No event loop (scripts, direct helper calls): write through
+        flush_audit_entries()
+        return
+    # A handle from another (possibly closed) loop will never fire, so reschedule
+    if _audit_flush_handle is None or _audit_flush_loop is not loop:
+        _audit_flush_handle = loop.call_later(AUDIT_FLUSH_INTERVAL_MS / 1000, flush_audit_entries)
+        _audit_flush_loop = loop
+
 def write_audit_entry(action: str, actor: str, target: str, reason: Optional[str] = None, 
                      details: Optional[Dict[str, Any]] = None):
     """
     Write an audit entry for all lifecycle operations
     
+    Entries are buffered and appended to the log in batches (on size, on a short
+    timer, or whenever the log is read), keeping the per-call cost to one append.
+    
     Args:
         action: Action being performed (use AUDIT_ACTION_* constants)
         actor: Who is performing the action (system, user_id, etc.)
@@ -150,7 +347,7 @@ def write_audit_entry(action: str, actor: str, target: str, reason: Optional[str
         details: Optional additional details
     """
     entry = AuditEntry(
-        audit_id=str(uuid.uuid4()),
+        audit_id=new_id(),
         action=action,
         actor=actor,
         target=target,
@@ -158,8 +355,10 @@ def write_audit_entry(action: str, actor: str, target: str, reason: Optional[str
         timestamp=datetime.utcnow(),
         details=details
     )
-    storage.add_audit_entry(entry)
-    print(f"AUDIT: {action} by {actor} on {target} - {reason}")
+    if storage.add_audit_entry(entry) >= AUDIT_BATCH_SIZE:
+        flush_audit_entries()
+    else:
+        _schedule_audit_flush()
 
 # 3. Token Lifecycle Helpers (Idempotent)
 def freeze_token(token_id: str, reason: str, actor: str = "system", 
@@ -174,23 +373,26 @@ def freeze_token(token_id: str, reason: str, actor: str = "system",
         auto_revoke_candidate: Whether this is a candidate for auto-revocation
         
     Returns:
-        dict: Result with success status and current state
+        dict: Result with success status and the token's resulting status
+              ("token_status"), so callers need no follow-up lookup
     """
     token_state = storage.get_token(token_id)
     
     if not token_state:
-        # Create new token in frozen state
+        # Create new token in frozen state (one clock read for both timestamps)
+        now = datetime.utcnow()
         token_state = TokenState(
             token_id=token_id,
             status=TOKEN_STATUS_FROZEN,
-            frozen_at=datetime.utcnow(),
+            frozen_at=now,
+            created_at=now,
             reason=reason,
             auto_revoke_candidate=auto_revoke_candidate
         )
         storage.save_token(token_state)
         write_audit_entry(AUDIT_ACTION_FREEZE, actor, token_id, reason, 
                          {"auto_revoke_candidate": auto_revoke_candidate})
-        return {"success": True, "action": "frozen", "was_active": False}
+        return {"success": True, "action": "frozen", "was_active": False, "token_status": TOKEN_STATUS_FROZEN}
     
     if token_state.status == TOKEN_STATUS_ACTIVE:
         # Freeze active token
@@ -201,15 +403,15 @@ def freeze_token(token_id: str, reason: str, actor: str = "system",
         storage.save_token(token_state)
         write_audit_entry(AUDIT_ACTION_FREEZE, actor, token_id, reason,
                          {"auto_revoke_candidate": auto_revoke_candidate})
-        return {"success": True, "action": "frozen", "was_active": True}
+        return {"success": True, "action": "frozen", "was_active": True, "token_status": TOKEN_STATUS_FROZEN}
     
     elif token_state.status == TOKEN_STATUS_FROZEN:
         # Already frozen - idempotent
-        return {"success": True, "action": "already_frozen", "was_active": False}
+        return {"success": True, "action": "already_frozen", "was_active": False, "token_status": TOKEN_STATUS_FROZEN}
     
     elif token_state.status == TOKEN_STATUS_REVOKED:
         # Cannot freeze revoked token
-        return {"success": False, "error": "cannot_freeze_revoked_token", "current_status": "revoked"}
+        return {"success": False, "error": "cannot_freeze_revoked_token", "current_status": "revoked", "token_status": TOKEN_STATUS_REVOKED}
 
 def unfreeze_token(token_id: str, actor: str, reason: str = "verification_success") -> Dict[str, Any]:
     """
@@ -221,12 +423,13 @@ def unfreeze_token(token_id: str, actor: str, reason: str = "verification_succes
         reason: Reason for unfreezing
         
     Returns:
-        dict: Result with success status and current state
+        dict: Result with success status and the token's resulting status
+              ("token_status")
     """
     token_state = storage.get_token(token_id)
     
     if not token_state:
-        return {"success": False, "error": "token_not_found"}
+        return {"success": False, "error": "token_not_found", "token_status": TOKEN_STATUS_ACTIVE}
     
     if token_state.status == TOKEN_STATUS_FROZEN:
         # Unfreeze frozen token
@@ -236,15 +439,15 @@ def unfreeze_token(token_id: str, actor: str, reason: str = "verification_succes
         token_state.auto_revoke_candidate = False
         storage.save_token(token_state)
         write_audit_entry(AUDIT_ACTION_UNFREEZE, actor, token_id, reason)
-        return {"success": True, "action": "unfrozen"}
+        return {"success": True, "action": "unfrozen", "token_status": TOKEN_STATUS_ACTIVE}
     
     elif token_state.status == TOKEN_STATUS_ACTIVE:
         # Already active - idempotent
-        return {"success": True, "action": "already_active"}
+        return {"success": True, "action": "already_active", "token_status": TOKEN_STATUS_ACTIVE}
     
     elif token_state.status == TOKEN_STATUS_REVOKED:
         # Cannot unfreeze revoked token
-        return {"success": False, "error": "cannot_unfreeze_revoked_token", "current_status": "revoked"}
+        return {"success": False, "error": "cannot_unfreeze_revoked_token", "current_status": "revoked", "token_status": TOKEN_STATUS_REVOKED}
 
 def revoke_token(token_id: str, actor: str, reason: str) -> Dict[str, Any]:
     """
@@ -256,21 +459,24 @@ def revoke_token(token_id: str, actor: str, reason: str) -> Dict[str, Any]:
         reason: Reason for revocation
         
     Returns:
-        dict: Result with success status
+        dict: Result with success status and the token's resulting status
+              ("token_status")
     """
     token_state = storage.get_token(token_id)
     
     if not token_state:
-        # Create token in revoked state
+        # Create token in revoked state (one clock read for both timestamps)
+        now = datetime.utcnow()
         token_state = TokenState(
             token_id=token_id,
             status=TOKEN_STATUS_REVOKED,
-            revoked_at=datetime.utcnow(),
+            revoked_at=now,
+            created_at=now,
             reason=reason
         )
         storage.save_token(token_state)
         write_audit_entry(AUDIT_ACTION_REVOKE, actor, token_id, reason)
-        return {"success": True, "action": "revoked", "was_existing": False}
+        return {"success": True, "action": "revoked", "was_existing": False, "token_status": TOKEN_STATUS_REVOKED}
     
     if token_state.status != TOKEN_STATUS_REVOKED:
         # Revoke token atomically
@@ -281,11 +487,11 @@ def revoke_token(token_id: str, actor: str, reason: str) -> Dict[str, Any]:
         storage.save_token(token_state)
         write_audit_entry(AUDIT_ACTION_REVOKE, actor, token_id, reason, 
                          {"previous_status": previous_status})
-        return {"success": True, "action": "revoked", "previous_status": previous_status}
+        return {"success": True, "action": "revoked", "previous_status": previous_status, "token_status": TOKEN_STATUS_REVOKED}
     
     else:
         # Already revoked - idempotent
-        return {"success": True, "action": "already_revoked"}
+        return {"success": True, "action": "already_revoked", "token_status": TOKEN_STATUS_REVOKED}
 
 # 4. Validation Helpers
 def validate_llm_recommendation(recommendation: str) -> str:
@@ -375,7 +581,7 @@ def create_event(token_id: str, merchant_id: str, amount: float, risk_score: int
         auto_revoke_candidate = (risk_level == "HIGH")
     
     event = Event(
-        event_id=str(uuid.uuid4()),
+        event_id=new_id(),
         token_id=token_id,
         merchant_id=merchant_id,
         amount=amount,
@@ -388,19 +594,74 @@ def create_event(token_id: str, merchant_id: str, amount: float, risk_score: int
     storage.save_event(event)
     return event
 
+def transition(event: Event, new_event_status: str,
+               token_action: Callable[..., Dict[str, Any]], **action_kwargs) -> Dict[str, Any]:
+    """
+    Apply a token lifecycle action and an event status change as one storage operation
+    
+    Args:
+        event: Event being resolved (its token_id is the action's target)
+        new_event_status: Status to save on the event
+        token_action: freeze_token, unfreeze_token or revoke_token
+        **action_kwargs: Remaining arguments for token_action (actor, reason, ...)
+        
+    Returns:
+        dict: token_action's result, including the resulting "token_status"
+    """
+    result = token_action(token_id=event.token_id, **action_kwargs)
+    event.status = new_event_status
+    storage.save_event(event)
+    return result
+
 # 6. Helper for getting current system state
 def get_token_status(token_id: str) -> str:
     """Get current token status"""
     token_state = storage.get_token(token_id)
     return token_state.status if token_state else TOKEN_STATUS_ACTIVE
 
+def get_token_summary(token_id: str) -> Dict[str, Any]:
+    """Get token state summary for API responses (datetimes left for the JSON encoder)
+    
+    Returns a copy, so callers can't modify the cached summary.
+    """
+    summary = storage.token_summary_cache.get(token_id)
+    if summary is not None:
+        return dict(summary)
+    
+    token_state = storage.get_token(token_id)
+    if not token_state:
+        summary = {
+            "token_id": token_id,
+            "status": TOKEN_STATUS_ACTIVE,
+            "message": "Token not found in system - default status"
+        }
+    else:
+        summary = {
+            "token_id": token_id,
+            "status": token_state.status,
+            "created_at": token_state.created_at,
+            "frozen_at": token_state.frozen_at,
+            "revoked_at": token_state.revoked_at,
+            "reason": token_state.reason,
+            "auto_revoke_candidate": token_state.auto_revoke_candidate
+        }
+    storage.token_summary_cache[token_id] = summary
+    return dict(summary)
+
 def get_event_summary(event_id: str) -> Optional[Dict[str, Any]]:
-    """Get event summary for API responses"""
+    """Get event summary for API responses (datetimes left for the JSON encoder)
+    
+    Returns a copy, so callers can't modify the cached summary.
+    """
+    summary = storage.event_summary_cache.get(event_id)
+    if summary is not None:
+        return dict(summary)
+    
     event = storage.get_event(event_id)
     if not event:
         return None
     
-    return {
+    summary = {
         "event_id": event.event_id,
         "token_id": event.token_id,
         "merchant_id": event.merchant_id,
@@ -410,6 +671,8 @@ def get_event_summary(event_id: str) -> Optional[Dict[str, Any]]:
         "decision": event.decision,
         "auto_revoke_candidate": event.auto_revoke_candidate,
         "verified_by": event.verified_by,
-        "created_at": event.created_at.isoformat(),
-        "updated_at": event.updated_at.isoformat()
-    }
\ No newline at end of file
+        "created_at": event.created_at,
+        "updated_at": event.updated_at
+    }
+    storage.event_summary_cache[event_id] = summary
+    return dict(summary)
\ No newline at end of file
@@ -10,12 +10,18 @@ from datetime import datetime, timedelta
 import json
 
 # Import the FastAPI app and components to test
+import app as app_module
+import helpers
 from app import app
-from helpers import storage, classify_risk_score, freeze_token, unfreeze_token, revoke_token
+from helpers import storage, classify_risk_score, freeze_token, unfreeze_token, revoke_token, write_audit_entry
+from clients import CircuitBreaker, CircuitOpenError
+from agents.merchant_communicator import MerchantCommunicator, MERCHANT_PENDING_KEY
+from agents.token_trust_orchestrator import TokenTrustOrchestrator, ACTIVE_SESSIONS_KEY
 from config import (
     TOKEN_STATUS_ACTIVE, TOKEN_STATUS_FROZEN, TOKEN_STATUS_REVOKED,
     EVENT_STATUS_APPROVED, EVENT_STATUS_WAITING_VERIFICATION,
-    EVENT_STATUS_VERIFIED_SUCCESS, EVENT_STATUS_VERIFIED_FAILURE
+    EVENT_STATUS_VERIFIED_SUCCESS, EVENT_STATUS_VERIFIED_FAILURE,
+    BATCH_MAX_REQUESTS
 )
 
 client = TestClient(app)
@@ -495,5 +501,374 @@ class TestRobustTokenTrustWorkflow:
         assert "unfreeze" in actions  
         assert "revoke" in actions
 
+class TestAuditBatching:
+    """Audit entries written on the event loop are buffered until read"""
+    
+    def setup_method(self):
+        """Reset storage before each test"""
+        storage.tokens.clear()
+        storage.events.clear()
+        storage.audit_log.clear()
+    
+    def test_audit_entries_are_batched_until_read(self):
+        """Entries written on the event loop are buffered, then flushed by any read"""
+        async def write_entries():
+            for i in range(3):
+                write_audit_entry(action="test", actor="tester", target="batched_target", reason=str(i))
+            return len(storage._audit_pending)
+        
+        assert asyncio.run(write_entries()) == 3
+        entries = storage.get_audit_entries("batched_target", 10)
+        assert [entry.reason for entry in entries] == ["0", "1", "2"]
+        assert not storage._audit_pending
+
+class TestCircuitBreaker:
+    """Breaker around the Groq calls"""
+    
+    def test_circuit_breaker_opens_and_fails_fast(self):
+        """After fail_max consecutive failures calls fail fast until the cool-down"""
+        breaker = CircuitBreaker(fail_max=2, reset_timeout=60)
+        calls = []
+        
+        def failing():
+            calls.append(1)
+            raise ValueError("groq down")
+        
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                breaker.call(failing)
+        assert breaker.is_open
+        
+        with pytest.raises(CircuitOpenError):
+            breaker.call(failing)
+        assert len(calls) == 2
+    
+    def test_circuit_breaker_half_open_admits_one_trial(self):
+        """Once cooled down, one trial call runs while the others are rejected"""
+        breaker = CircuitBreaker(fail_max=1, reset_timeout=0)
+        
+        def failing():
+            raise ValueError("groq down")
+        
+        with pytest.raises(ValueError):
+            breaker.call(failing)
+        
+        async def scenario():
+            release = asyncio.Event()
+            
+            async def slow_success():
+                await release.wait()
+                return "ok"
+            
+            trial = asyncio.create_task(breaker.call_async(slow_success))
+            await asyncio.sleep(0)
+            with pytest.raises(CircuitOpenError):
+                await breaker.call_async(slow_success)
+            release.set()
+            return await trial
+        
+        assert asyncio.run(scenario()) == "ok"
+        assert not breaker.is_open
+        
+        # Open it again; a failed trial re-opens the circuit
+        with pytest.raises(ValueError):
+            breaker.call(failing)
+        with pytest.raises(ValueError):
+            breaker.call(failing)
+        assert breaker.is_open
+
+class TestRiskCheckBatch:
+    """Batched /risk-check scoring"""
+    
+    def test_risk_check_batch(self, monkeypatch):
+        """/risk-check/batch scores every item and keeps request order"""
+        async def fake_analyze(transaction):
+            return {"risk_score": int(transaction["amount"]), "decision": "TEST", "explanation": "scored"}
+        
+        monkeypatch.setattr(app_module.risk_agent, "analyze_risk_async", fake_analyze)
+        batch = [
+            {"token": f"tok_{score}", "merchant_id": "m", "amount": score, "security_context": {}}
+            for score in (10, 50, 90)
+        ]
+        
+        response = client.post("/risk-check/batch", json=batch)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 3
+        assert [r["risk_level"] for r in data["results"]] == ["LOW", "MEDIUM", "HIGH"]
+        assert [r["token_valid"] for r in data["results"]] == [True, True, False]
+    
+    def test_risk_check_batch_too_large(self):
+        """/risk-check/batch rejects more than RISK_CHECK_BATCH_MAX_SIZE items"""
+        item = {"token": "t", "merchant_id": "m", "amount": 1.0, "security_context": {}}
+        response = client.post("/risk-check/batch", json=[item] * (app_module.RISK_CHECK_BATCH_MAX_SIZE + 1))
+        assert response.status_code == 400
+
+class TestFastPathRules:
+    """Rule-based classification ahead of the LLM"""
+    
+    def test_fast_path_rules(self, monkeypatch):
+        """Unambiguous transactions are classified by _FAST_PATH_RULES without the LLM"""
+        agent = app_module.risk_agent
+        
+        risky = agent.fast_classify({
+            "token": "fast_path_new_token", "amount": 100.0,
+            "new_device": True, "vpn_detected": True
+        })
+        assert risky["risk_score"] == 90 and risky["decision"] == "HIGH"
+        
+        monkeypatch.setitem(agent.memory, "fast_path_known_token", {
+            "transactions": [{"amount": 100.0}], "avg_amount": 100.0
+        })
+        trusted = {
+            "token": "fast_path_known_token", "amount": 120.0, "device_trust_score": 95,
+            "token_age_minutes": 60, "usual_location": "Mumbai", "current_location": "Mumbai"
+        }
+        safe = agent.fast_classify(trusted)
+        assert safe["risk_score"] == 10 and safe["decision"] == "APPROVE"
+        
+        # Ambiguous: falls through to the LLM
+        assert agent.fast_classify({**trusted, "device_trust_score": 50}) is None
+
+class FakeAsyncRedis:
+    """In-memory stand-in for the redis.asyncio commands the agents mirror state with"""
+    
+    def __init__(self):
+        self.values = {}
+        self.sets = {}
+        self.zsets = {}
+    
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+    
+    def _setex(self, key, ttl, value):
+        self.values[key] = value
+        return True
+    
+    def _expire(self, key, ttl):
+        return True
+    
+    def _sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(members)
+        return len(members)
+    
+    def _srem(self, key, *members):
+        self.sets.get(key, set()).difference_update(members)
+        return len(members)
+    
+    def _zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+        return len(mapping)
+    
+    def _zremrangebyscore(self, key, low, high):
+        zset = self.zsets.get(key, {})
+        stale = [member for member, score in zset.items() if float(low) <= score <= float(high)]
+        for member in stale:
+            del zset[member]
+        return len(stale)
+    
+    def _zcard(self, key):
+        return len(self.zsets.get(key, {}))
+    
+    async def get(self, key):
+        return self.values.get(key)
+    
+    async def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+    
+    async def smembers(self, key):
+        return set(self.sets.get(key, set()))
+    
+    async def srem(self, key, *members):
+        return self._srem(key, *members)
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+    
+    def __getattr__(self, name):
+        def queue(*args):
+            self.commands.append((name, args))
+            return self
+        return queue
+    
+    async def execute(self):
+        return [getattr(self.redis, "_" + name)(*args) for name, args in self.commands]
+
+class TestSessionMirror:
+    """Orchestrator sessions shared through Redis"""
+    
+    def test_sessions_are_mirrored_to_redis(self):
+        """Sessions persisted by one worker are visible to, and counted by, another"""
+        redis = FakeAsyncRedis()
+        worker_a = TokenTrustOrchestrator(redis_client=redis)
+        worker_b = TokenTrustOrchestrator(redis_client=redis)
+        worker_a.active_sessions["session_1"] = {
+            "short_id": "session_", "status": "risk_assessed", "created_at": datetime.now(), "steps": []
+        }
+        
+        asyncio.run(worker_a._persist_session("session_1"))
+        
+        assert asyncio.run(worker_b.get_session_status("session_1"))["status"] == "risk_assessed"
+        assert asyncio.run(worker_b.count_active_sessions()) == 1
+        
+        # Sessions past their TTL drop out of the count
+        redis.zsets[ACTIVE_SESSIONS_KEY]["session_1"] = 0
+        assert asyncio.run(worker_b.count_active_sessions()) == 0
+
+class TestMerchantPendingIndex:
+    """Per-merchant index of pending verifications"""
+    
+    def test_merchant_pending_index_drops_finished_verifications(self):
+        """Completed verifications leave the merchant's pending set and lookups"""
+        redis = FakeAsyncRedis()
+        communicator = MerchantCommunicator(redis_client=redis)
+        expires_at = (datetime.now() + timedelta(minutes=10)).isoformat()
+        first, second = (
+            {"session_id": session_id, "merchant_id": "merchant_9", "status": "pending", "expires_at": expires_at}
+            for session_id in ("s1", "s2")
+        )
+        
+        asyncio.run(communicator._persist_verification(first))
+        asyncio.run(communicator._persist_verification(second))
+        assert set(asyncio.run(communicator.get_merchant_verifications("merchant_9"))) == {"s1", "s2"}
+        
+        first["status"] = "completed"
+        asyncio.run(communicator._persist_verification(first))
+        
+        assert set(asyncio.run(communicator.get_merchant_verifications("merchant_9"))) == {"s2"}
+        assert redis.sets[MERCHANT_PENDING_KEY.format("merchant_9")] == {"s2"}
+
+class TestV2Batch:
+    """/v2/batch envelope handling"""
+    
+    def setup_method(self):
+        """Reset storage before each test"""
+        storage.tokens.clear()
+        storage.events.clear()
+        storage.audit_log.clear()
+    
+    def test_v2_batch_runs_sub_requests_in_order(self):
+        """/v2/batch returns one status and body per sub-request, in request order"""
+        response = client.post("/v2/batch", json={"requests": [
+            {"method": "POST", "path": "/analyze", "body": {
+                "token_id": "batch_token", "merchant_id": "batch_merchant", "amount": 10.0, "risk_score": 10
+            }},
+            {"method": "GET", "path": "/health"},
+            {"method": "POST", "path": "/analyze", "body": {"token_id": "batch_token"}},
+            {"method": "POST", "path": "/merchant-response", "body": {
+                "event_id": "missing_event", "user_response": "yes", "verification_method": "sms_2fa"
+            }}
+        ]})
+        
+        assert response.status_code == 200
+        statuses = [item["status"] for item in response.json()["responses"]]
+        assert statuses == [200, 404, 422, 404]
+        assert response.json()["responses"][0]["body"]["token_status"] == TOKEN_STATUS_ACTIVE
+    
+    def test_v2_batch_size_limits(self):
+        """Empty and oversized /v2/batch envelopes are rejected by validation"""
+        item = {"method": "GET", "path": "/health"}
+        assert client.post("/v2/batch", json={"requests": []}).status_code == 422
+        oversized = {"requests": [item] * (BATCH_MAX_REQUESTS + 1)}
+        assert client.post("/v2/batch", json=oversized).status_code == 422
+
+class TestAuditIndex:
+    """Per-target audit index"""
+    
+    def setup_method(self):
+        """Reset storage before each test"""
+        storage.tokens.clear()
+        storage.events.clear()
+        storage.audit_log.clear()
+    
+    def test_audit_index_limit_and_rebuild(self):
+        """Per-target reads return the newest `limit` entries and survive a direct clear"""
+        for i in range(5):
+            write_audit_entry(action="test", actor="tester", target="indexed_target", reason=str(i))
+            write_audit_entry(action="test", actor="tester", target="other_target", reason=str(i))
+        
+        assert [entry.reason for entry in storage.get_audit_entries("indexed_target", 2)] == ["3", "4"]
+        assert len(storage.get_audit_entries("indexed_target", 0)) == 5
+        
+        storage.audit_log.clear()
+        assert storage.get_audit_entries("indexed_target", 10) == []
+
+class TestTokenSummaryCache:
+    """Cached token status summaries"""
+    
+    def setup_method(self):
+        """Reset storage before each test"""
+        storage.tokens.clear()
+        storage.events.clear()
+        storage.audit_log.clear()
+    
+    def test_status_summary_cache_follows_storage(self):
+        """Cached summaries are copies and are dropped when storage is cleared directly"""
+        freeze_token("cached_token", "test freeze")
+        summary = client.get("/v2/token/cached_token/status").json()
+        assert summary["status"] == TOKEN_STATUS_FROZEN
+        
+        helpers.get_token_summary("cached_token")["status"] = "tampered"
+        assert helpers.get_token_summary("cached_token")["status"] == TOKEN_STATUS_FROZEN
+        
+        storage.tokens.clear()
+        assert client.get("/v2/token/cached_token/status").json()["status"] == TOKEN_STATUS_ACTIVE
+
+class TestMerchantResponseMatching:
+    """Success-indicator matching in merchant responses"""
+    
+    def setup_method(self):
+        """Reset storage before each test"""
+        storage.tokens.clear()
+        storage.events.clear()
+        storage.audit_log.clear()
+    
+    def test_merchant_response_matches_whole_words(self):
+        """Success indicators only count as whole words, not as substrings"""
+        cases = {
+            "Yes, I authorized this transaction": True,
+            "APPROVED by the store manager": True,
+            "Yesterday it was fine, but not today": False,
+            "That card is invalid": False,
+            "No, this looks like fraud": False
+        }
+        for i, (user_response, expected) in enumerate(cases.items()):
+            analysis = client.post("/v2/analyze", json={
+                "token_id": f"word_token_{i}", "merchant_id": "word_merchant", "amount": 50.0, "risk_score": 65
+            }).json()
+            response = client.post("/v2/merchant-response", json={
+                "event_id": analysis["event_id"],
+                "user_response": user_response,
+                "verification_method": "sms_2fa"
+            })
+            assert response.status_code == 200
+            assert response.json()["verification_successful"] == expected, user_response
+
+class TestAuditSpill:
+    """Audit log cap and spill file"""
+    
+    def setup_method(self):
+        """Reset storage before each test"""
+        storage.tokens.clear()
+        storage.events.clear()
+        storage.audit_log.clear()
+    
+    def test_audit_eviction_spills_oldest_entries(self, monkeypatch, tmp_path):
+        """Entries past AUDIT_LOG_MAX_ENTRIES leave the log and index and land in the spill file"""
+        spill_path = tmp_path / "audit_spill.jsonl"
+        monkeypatch.setattr(helpers, "AUDIT_LOG_MAX_ENTRIES", 3)
+        monkeypatch.setattr(helpers, "AUDIT_SPILL_PATH", str(spill_path))
+        
+        for i in range(5):
+            write_audit_entry(action="test", actor="tester", target=f"spill_target_{i}")
+        storage.wait_for_audit_spill()
+        
+        assert [entry.target for entry in storage.audit_log] == ["spill_target_2", "spill_target_3", "spill_target_4"]
+        assert storage.get_audit_entries("spill_target_0", 10) == []
+        spilled = [json.loads(line) for line in spill_path.read_text().splitlines()]
+        assert [entry["target"] for entry in spilled] == ["spill_target_0", "spill_target_1"]
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])
\ No newline at end of file